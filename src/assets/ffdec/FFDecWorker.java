@@ -0,0 +1,107 @@
+/*
+ * Part of Dynamic Interface Construction Kit (DICK).
+ * Long-lived FFDec process that executes commandline commands read from stdin.
+ *
+ * Protocol:
+ *   Each line on stdin is one command with its arguments separated by tabs.
+ *   The output of the command is written to stdout, followed by a status line
+ *   "<<<FFDEC_WORKER_STATUS:<exit code>>>>".
+ *   The status is written at the start of a new line if possible. It can
+ *   follow output that does not end with a line break on the same line.
+ *   "<<<FFDEC_WORKER_STATUS:READY>>>" is written once the worker accepts commands,
+ *   "<<<FFDEC_WORKER_STATUS:READY:NOGUARD>>>" if it exits after commands
+ *   that call System.exit because the JVM does not support security managers.
+ *
+ * Launched with the Java source launcher (Java 11+):
+ *   java -cp ffdec.jar FFDecWorker.java
+ *
+ * Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+ */
+
+import java.io.BufferedReader;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+
+public class FFDecWorker {
+
+    static final String STATUS_PREFIX = "<<<FFDEC_WORKER_STATUS:";
+    static final String STATUS_SUFFIX = ">>>";
+
+    /**
+     * Thrown instead of exiting the JVM when FFDec calls System.exit.
+     */
+    static class ExitException extends SecurityException {
+        final int status;
+
+        ExitException(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    /**
+     * Prevents FFDec from exiting the JVM after a command.
+     * Returns false if the JVM does not support security managers anymore.
+     * The worker then exits after every command that calls System.exit
+     * and is restarted by DICK.
+     */
+    @SuppressWarnings("removal")
+    static boolean installExitGuard() {
+        try {
+            System.setSecurityManager(new SecurityManager() {
+                @Override
+                public void checkPermission(Permission perm) {
+                }
+
+                @Override
+                public void checkPermission(Permission perm, Object context) {
+                }
+
+                @Override
+                public void checkExit(int status) {
+                    throw new ExitException(status);
+                }
+            });
+            return true;
+        } catch (UnsupportedOperationException | SecurityException ex) {
+            return false;
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        System.setOut(out);
+        System.setErr(out);
+
+        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        if (installExitGuard()) {
+            out.println(STATUS_PREFIX + "READY" + STATUS_SUFFIX);
+        } else {
+            out.println(STATUS_PREFIX + "READY:NOGUARD" + STATUS_SUFFIX);
+        }
+
+        String line;
+        while ((line = reader.readLine()) != null) {
+            if (line.isEmpty()) {
+                continue;
+            }
+
+            int status = 0;
+            try {
+                com.jpexs.decompiler.flash.gui.Main.main(line.split("\t"));
+            } catch (ExitException ex) {
+                status = ex.status;
+            } catch (Throwable ex) {
+                ex.printStackTrace(out);
+                status = 1;
+            }
+
+            out.println(STATUS_PREFIX + status + STATUS_SUFFIX);
+        }
+    }
+}
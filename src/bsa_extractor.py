@@ -6,16 +6,349 @@ Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
 """
 
 
-from pathlib import Path
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path, PureWindowsPath
+from typing import BinaryIO, Generator, NamedTuple
+
+import lz4.frame
 from bethesda_structs.archive.bsa import BSAArchive as _BSAArchive
 
 
+def normalize_path(path: str | Path):
+    """
+    Normalizes <path> to a lowercase string with forward slashes
+    so that it can be used as case-insensitive lookup key.
+
+    For example:
+    ```
+    path = 'Interface\\RaceSex_Menu.swf'
+    ```
+    ==>
+    ```
+    'interface/racesex_menu.swf'
+    ```
+    """
+
+    parts = re.split(r"[\\/]", str(path))
+
+    return "/".join(
+        part for part in parts
+        if part not in ("", ".")
+    ).lower()
+
+
+class FileRecord(NamedTuple):
+    """
+    Location of a single file in a BSA.
+    """
+
+    filepath: str
+    """Relative path of file in its original case."""
+
+    offset: int
+    """Offset of raw file data in BSA."""
+
+    size: int
+    """Size of raw file data in BSA."""
+
+    compressed: bool
+    """If file data is compressed."""
+
+
+class RecordStream(io.RawIOBase):
+    """
+    Readable stream over chunks yielded by `BSAArchive.iter_record`.
+    """
+
+    def __init__(self, chunks: Generator[memoryview | bytes, None, None]):
+        super().__init__()
+
+        self._chunks = chunks
+        self._chunk = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not len(self._chunk):
+            chunk = next(self._chunks, None)
+
+            if chunk is None:
+                return 0
+
+            self._chunk = memoryview(chunk)
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+
+        return size
+
+    def close(self):
+        self._chunk = memoryview(b"")
+        self._chunks.close()
+
+        super().close()
+
+
+class BSAIndexCache:
+    """
+    Persistent cache for BSA indexes.
+
+    Entries are keyed by the archive's path and only used
+    if size, modification time and header hash still match.
+    """
+
+    HEADER_SIZE = 36
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = cache_path
+        self.entries: dict[str, dict] = {}
+        self.changed = False
+
+    def load(self):
+        """
+        Loads cache from disk. A missing or broken cache file
+        results in an empty cache.
+        """
+
+        try:
+            self.entries = json.loads(self.cache_path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """
+        Saves cache to disk if it was changed.
+        Entries of archives that no longer exist are dropped.
+        """
+
+        if not self.changed:
+            return
+
+        self.entries = {
+            path: entry
+            for path, entry in self.entries.items()
+            if os.path.isfile(path)
+        }
+
+        os.makedirs(self.cache_path.parent, exist_ok=True)
+        self.cache_path.write_text(json.dumps(self.entries), encoding="utf8")
+        self.changed = False
+
+    @staticmethod
+    def get_key(filepath: Path, header: bytes):
+        """
+        Returns dictionary with size, modification time and
+        header hash of <filepath>.
+        """
+
+        stat = filepath.stat()
+
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "header_hash": hashlib.sha256(header).hexdigest(),
+        }
+
+    def get(self, filepath: Path, header: bytes):
+        """
+        Returns cached entry for <filepath> or None
+        if there is no valid entry.
+        """
+
+        entry = self.entries.get(str(filepath))
+
+        if entry is None or entry["key"] != self.get_key(filepath, header):
+            return None
+
+        return entry
+
+    def set(
+        self,
+        filepath: Path,
+        header: bytes,
+        version: int,
+        embed_names: bool,
+        index: dict[str, "FileRecord"]
+    ):
+        """
+        Stores index of <filepath> in cache.
+        """
+
+        self.entries[str(filepath)] = {
+            "key": self.get_key(filepath, header),
+            "version": version,
+            "embed_names": embed_names,
+            "files": [list(record) for record in index.values()],
+        }
+        self.changed = True
+
+
 class BSAArchive(_BSAArchive):
     """
     Modified version of BSAArchive class.
     Has method to extract single files.
+
+    Files are looked up in a case-insensitive index
+    that is built once from the parsed directory tables
+    or loaded from a BSAIndexCache.
+
+    Archives opened with `BSAArchive.open` are memory-mapped
+    and file data is handed out in chunks, so memory usage
+    does not depend on the size of the records.
     """
 
+    CHUNK_SIZE = 1024 * 1024
+
+    _index: dict[str, FileRecord] = None
+    _stream: BinaryIO = None
+    _mmap: mmap.mmap = None
+    version: int = None
+    embed_names: bool = None
+
+    def __attrs_post_init__(self):
+        # Archives opened with `BSAArchive.open` are read lazily
+        # and have no content to parse
+        if self.content is not None:
+            super().__attrs_post_init__()
+            self._load_header()
+        elif self.filepath:
+            self.filepath = Path(self.filepath)
+
+    @classmethod
+    def open(cls, filepath: str | Path, index_cache: BSAIndexCache = None):
+        """
+        Opens BSA at <filepath> as memory-mapped file.
+        Only the requested files are read from disk.
+
+        If <index_cache> has a valid entry for the archive,
+        its directory tables are not parsed at all.
+
+        Parameters:
+            filepath: str or Path, path to BSA
+            index_cache: BSAIndexCache, optional
+
+        Returns:
+            archive: BSAArchive
+        """
+
+        filepath = Path(filepath).resolve()
+
+        archive = cls(None, filepath=filepath)
+        archive._stream = filepath.open("rb")
+        archive._mmap = mmap.mmap(archive._stream.fileno(), 0, access=mmap.ACCESS_READ)
+        header = archive._mmap[:BSAIndexCache.HEADER_SIZE]
+
+        entry = index_cache.get(filepath, header) if index_cache is not None else None
+
+        if entry is not None:
+            archive.version = entry["version"]
+            archive.embed_names = entry["embed_names"]
+            archive._index = {
+                normalize_path(record[0]): FileRecord(*record)
+                for record in entry["files"]
+            }
+        else:
+            archive.container = archive.archive_struct.parse_stream(archive._mmap)
+            archive._load_header()
+
+            if index_cache is not None:
+                index_cache.set(
+                    filepath,
+                    header,
+                    archive.version,
+                    archive.embed_names,
+                    archive.index
+                )
+
+        return archive
+
+    def close(self):
+        """
+        Closes memory map and file handle of archives
+        opened with `BSAArchive.open`.
+        """
+
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def _load_header(self):
+        header = self.container.header
+
+        self.version = header.version
+        self.embed_names = bool(header.archive_flags.files_prefixed)
+
+    @property
+    def index(self):
+        """
+        Dictionary with normalized file paths as keys
+        and FileRecords as values.
+        """
+
+        if self._index is None:
+            self._index = self._build_index()
+
+        return self._index
+
+    def _build_index(self):
+        index: dict[str, FileRecord] = {}
+
+        header = self.container.header
+        file_index = 0
+
+        for directory_block in self.container.directory_blocks:
+            directory_path = PureWindowsPath(directory_block.name[:-1])
+
+            for file_record in directory_block.file_records:
+                filepath = directory_path / self.container.file_names[file_index]
+                file_index += 1
+
+                size = file_record.size & self.SIZE_MASK
+                compressed = size > 0 and (
+                    header.archive_flags.files_compressed
+                    != bool(file_record.size & self.COMPRESSED_MASK)
+                )
+
+                index[normalize_path(filepath)] = FileRecord(
+                    filepath=filepath.as_posix(),
+                    offset=file_record.offset,
+                    size=size,
+                    compressed=compressed
+                )
+
+        return index
+
+    def get_record(self, file: str | Path):
+        """
+        Returns FileRecord of <file>.
+
+        Parameters:
+            file: str or Path, relative to BSA's root folder
+
+        Raises:
+            FileNotFoundError: if <file> is not in BSA
+        """
+
+        record = self.index.get(normalize_path(file))
+
+        if record is None:
+            raise FileNotFoundError(f"No file {str(file)!r} in {str(self.filepath)!r}")
+
+        return record
+
     def contains_file(
             self,
             file: str | Path
@@ -30,13 +363,120 @@ class BSAArchive(_BSAArchive):
             file_exists: bool
         """
 
-        archive_files = list(self.iter_files())
+        return normalize_path(file) in self.index
+
+    def iter_record(self, record: FileRecord) -> Generator[memoryview | bytes, None, None]:
+        """
+        Yields data of <record> in chunks.
+
+        Uncompressed data is yielded as memoryview slices
+        of the archive without copying it. Compressed data is
+        decompressed chunk by chunk.
+        """
+
+        buffer = self._mmap if self._mmap is not None else self.content
+
+        with memoryview(buffer) as view:
+            data = self._get_data(view, record)
+            yield from self._iter_data(record, data)
+            data.release()
+
+    def _get_data(self, view: memoryview, record: FileRecord):
+        data = view[record.offset:record.offset + record.size]
+
+        # Skip full file path that is prefixed to the data
+        if self.version >= 104 and self.embed_names:
+            data = data[1 + data[0]:]
+
+        return data
+
+    def _iter_data(self, record: FileRecord, data: memoryview):
+        if not record.compressed:
+            for offset in range(0, len(data), self.CHUNK_SIZE):
+                yield data[offset:offset + self.CHUNK_SIZE]
+
+        # Skip original size
+        elif self.version >= 105:
+            yield from self._iter_lz4(data[4:])
+        else:
+            yield from self._iter_zlib(data[4:])
+
+    def _iter_zlib(self, data: memoryview):
+        decompressor = zlib.decompressobj()
+
+        for offset in range(0, len(data), self.CHUNK_SIZE):
+            chunk = data[offset:offset + self.CHUNK_SIZE]
+
+            while chunk:
+                yield decompressor.decompress(chunk, self.CHUNK_SIZE)
+                chunk = decompressor.unconsumed_tail
+
+        yield decompressor.flush()
+
+    def _iter_lz4(self, data: memoryview):
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+
+        for offset in range(0, len(data), self.CHUNK_SIZE):
+            yield decompressor.decompress(
+                data[offset:offset + self.CHUNK_SIZE],
+                max_length=self.CHUNK_SIZE
+            )
+
+            while not decompressor.needs_input and not decompressor.eof:
+                yield decompressor.decompress(b"", max_length=self.CHUNK_SIZE)
+
+    def read_record(self, record: FileRecord):
+        """
+        Reads and decompresses data of <record>.
+
+        Returns:
+            data: bytes
+        """
+
+        return b"".join(self.iter_record(record))
+
+    def open_file(self, file: str | Path):
+        """
+        Opens <file> as readable binary stream
+        that is not loaded into memory as a whole.
+
+        Parameters:
+            file: str or Path, relative to BSA's root folder
+
+        Returns:
+            stream: io.BufferedReader
+        """
+
+        return io.BufferedReader(RecordStream(self.iter_record(self.get_record(file))))
+
+    def read_file(self, file: str | Path):
+        """
+        Reads data of <file>.
+
+        Parameters:
+            file: str or Path, relative to BSA's root folder
+
+        Returns:
+            data: bytes
+        """
+
+        return self.read_record(self.get_record(file))
 
-        for archive_file in archive_files:
-            if Path(archive_file.filepath) == Path(file):
-                return True
+    @staticmethod
+    def _write_chunks(to_path: Path, chunks: Generator[memoryview | bytes, None, None]):
+        if not to_path.parent.is_dir():
+            to_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with to_path.open("wb") as stream:
+            for chunk in chunks:
+                stream.write(chunk)
+
+    def _write_record(self, to_path: Path, record: FileRecord):
+        self._write_chunks(to_path, self.iter_record(record))
 
-        return False
+    def _write_payload(self, to_path: Path, record: FileRecord, payload: bytes):
+        with memoryview(payload) as data:
+            self._write_chunks(to_path, self._iter_data(record, data))
 
     def extract_file(
             self,
@@ -44,7 +484,7 @@ class BSAArchive(_BSAArchive):
             file: str | Path
     ):
         """
-        Extracts <file> from BSA.
+        Extracts <file> from BSA to <to_dir>/<file>.
 
         Parameters:
             to_dir: str, directory to extract <file> to.
@@ -56,16 +496,81 @@ class BSAArchive(_BSAArchive):
         if not to_dir.is_dir():
             raise NotADirectoryError(f"No directory {to_dir!r} exists")
 
-        archive_files = list(self.iter_files())
+        self._write_record(to_dir / file, self.get_record(file))
 
-        for archive_file in archive_files:
-            if Path(archive_file.filepath) == Path(file):
-                break
+    def extract_files(
+            self,
+            to_dir: str | Path,
+            files: list[str | Path],
+            max_workers: int = None
+    ):
+        """
+        Extracts <files> from BSA to <to_dir> in one forward pass
+        through the archive. Each file is written to <to_dir>/<file>.
 
-        to_path = to_dir / archive_file.filepath
+        Compressed records are read in that pass but decompressed
+        and written by a thread pool with <max_workers> threads.
 
-        if not to_path.parent.is_dir():
-            to_path.parent.mkdir(parents=True, exist_ok=True)
+        Parameters:
+            to_dir: str, directory to extract <files> to.
+            files: list of str or Path, relative paths to BSA's root folder.
+            max_workers: int, number of decompression threads,
+                defaults to number of CPU cores
 
-        with to_path.open("wb") as stream:
-            stream.write(archive_file.data)
+        Returns:
+            missing_files: list of files that are not in BSA
+        """
+
+        to_dir = Path(to_dir)
+
+        if not to_dir.is_dir():
+            raise NotADirectoryError(f"No directory {to_dir!r} exists")
+
+        records: dict[FileRecord, Path] = {}
+        missing_files: list[str | Path] = []
+
+        for file in files:
+            record = self.index.get(normalize_path(file))
+
+            if record is None:
+                missing_files.append(file)
+            else:
+                records[record] = to_dir / file
+
+        records = dict(sorted(records.items(), key=lambda item: item[0].offset))
+
+        if max_workers == 1 or not any(record.compressed for record in records):
+            for record, to_path in records.items():
+                self._write_record(to_path, record)
+
+            return missing_files
+
+        max_workers = max_workers or os.cpu_count() or 1
+        buffer = self._mmap if self._mmap is not None else self.content
+
+        with ThreadPoolExecutor(max_workers, thread_name_prefix="BSADecompressor") as executor:
+            # Limit number of payloads that are held in memory
+            max_pending = max_workers * 2
+            pending: set[Future] = set()
+
+            with memoryview(buffer) as view:
+                for record, to_path in records.items():
+                    if not record.compressed:
+                        self._write_record(to_path, record)
+                        continue
+
+                    with self._get_data(view, record) as data:
+                        payload = bytes(data)
+
+                    pending.add(executor.submit(self._write_payload, to_path, record, payload))
+
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                        for future in done:
+                            future.result()
+
+            for future in pending:
+                future.result()
+
+        return missing_files
@@ -0,0 +1,179 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains a memory-efficient tree for FFDec's XMLs.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+
+from pathlib import Path
+from xml.parsers import expat
+
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+class CompactElement:
+    """
+    Element with the part of ElementTree's Element API
+    that the patch creator uses.
+
+    Attribute names and values are stored in two tuples. Tuples of names
+    and all strings are shared between elements of the same tree,
+    since FFDec's XMLs repeat them a lot. Children are stored in a tuple,
+    elements without children have none at all.
+    Text and tails are not stored since the patch creator ignores them.
+    """
+
+    __slots__ = ("tag", "_names", "_values", "_children")
+
+    def __init__(self, tag: str, attrib: dict[str, str] = None):
+        self.tag = tag
+        self._names: tuple[str] = tuple(attrib) if attrib else ()
+        self._values: tuple[str] = tuple(attrib.values()) if attrib else ()
+        self._children: tuple[CompactElement] | None = None
+
+    def __repr__(self):
+        return f"<CompactElement {self.tag!r}>"
+
+    def __len__(self):
+        return len(self._children) if self._children else 0
+
+    def __iter__(self):
+        return iter(self._children or ())
+
+    def __getitem__(self, index: int | slice):
+        children = self._children or ()
+
+        if isinstance(index, slice):
+            return list(children[index])
+
+        return children[index]
+
+    def __setitem__(self, index: int | slice, value):
+        children = list(self._children or ())
+        children[index] = value
+        self._children = tuple(children) or None
+
+    def __delitem__(self, index: int | slice):
+        children = list(self._children or ())
+        del children[index]
+        self._children = tuple(children) or None
+
+    def append(self, element: "CompactElement"):
+        self._children = (self._children or ()) + (element,)
+
+    def extend(self, elements: list["CompactElement"]):
+        self._children = (self._children or ()) + tuple(elements) or None
+
+    def insert(self, index: int, element: "CompactElement"):
+        children = list(self._children or ())
+        children.insert(index, element)
+        self._children = tuple(children)
+
+    def remove(self, element: "CompactElement"):
+        children = list(self._children or ())
+        children.remove(element)
+        self._children = tuple(children) or None
+
+    def makeelement(self, tag: str, attrib: dict[str, str]):
+        return CompactElement(tag, attrib)
+
+    def get(self, key: str, default: str = None):
+        if key in self._names:
+            return self._values[self._names.index(key)]
+
+        return default
+
+    def set(self, key: str, value: str):
+        attrib = self.attrib
+        attrib[key] = value
+        self._names = tuple(attrib)
+        self._values = tuple(attrib.values())
+
+    def keys(self):
+        return list(self._names)
+
+    def items(self):
+        return list(zip(self._names, self._values))
+
+    @property
+    def attrib(self):
+        """
+        Copy of the attributes, changing it does not change the element.
+        """
+
+        return dict(zip(self._names, self._values))
+
+    def iter(self, tag: str = None):
+        if tag is None or self.tag == tag:
+            yield self
+
+        for child in self._children or ():
+            yield from child.iter(tag)
+
+
+class CompactTree:
+    """
+    Document of CompactElements like ElementTree's ElementTree.
+    """
+
+    def __init__(self, root: CompactElement):
+        self.root = root
+
+    def __repr__(self):
+        return "CompactTree"
+
+    def getroot(self):
+        return self.root
+
+    def iter(self, tag: str = None):
+        return self.root.iter(tag)
+
+
+def parse(xml_path: Path):
+    """
+    Parses <xml_path> into a CompactTree.
+    """
+
+    # Shared strings and tuples of attribute names and values
+    strings: dict[str, str] = {}
+    names: dict[tuple[str], tuple[str]] = {}
+    values: dict[tuple[str], tuple[str]] = {}
+
+    # Children of the elements that are currently open
+    stack: list[list[CompactElement]] = [[]]
+
+    def start_element(tag: str, attributes: list[str]):
+        element = CompactElement.__new__(CompactElement)
+        element.tag = strings.setdefault(tag, tag)
+
+        if attributes:
+            attribute_names = tuple(attributes[0::2])
+            element._names = names.setdefault(attribute_names, attribute_names)
+            attribute_values = tuple([
+                strings.setdefault(value, value)
+                for value in attributes[1::2]
+            ])
+            element._values = values.setdefault(attribute_values, attribute_values)
+        else:
+            element._names = element._values = ()
+
+        stack[-1].append(element)
+        stack.append([])
+
+    def end_element(tag: str):
+        children = stack.pop()
+        stack[-1][-1]._children = tuple(children) if children else None
+
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+
+    with xml_path.open("rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            parser.Parse(chunk, False)
+        parser.Parse(b"", True)
+
+    return CompactTree(stack[0][0])
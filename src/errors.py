@@ -34,3 +34,15 @@ class FFDecError(Exception):
     """
     For failed FFDec execution.
     """
+
+
+class UnsupportedXMLError(Exception):
+    """
+    For XMLs that cannot be compared by streaming them.
+    """
+
+
+class CancelledError(Exception):
+    """
+    For steps and FFDec commands that were started after a cancel.
+    """
@@ -5,58 +5,584 @@ Contains FFDec (JPEXS Free Flash Decompiler) interface.
 Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
 """
 
+import gzip
+import hashlib
 import logging
+import queue
+import shutil
 import subprocess
 import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
 import errors
+import utils
 from main import MainApp
 
 
+class JavaLauncher:
+    """
+    Builds java commands for FFDec with configurable JVM arguments.
+
+    If class data sharing is enabled, the classes loaded by FFDec are
+    dumped to an AppCDS archive on first run and the archive is reused
+    by later runs to reduce JVM startup time (Java 13+).
+    """
+
+    jar_path = (Path(".") / "assets" / "ffdec" / "ffdec.jar").resolve()
+    cache_path = (Path(".") / "cache").resolve()
+
+    # Java version on PATH, detected once
+    java_version: int = None
+
+    def __init__(self, jvm_args: list[str] = None, class_data_sharing: bool = True):
+        self.jvm_args = jvm_args if jvm_args is not None else ["-Xmx2048m"]
+        self.class_data_sharing = class_data_sharing
+
+    @classmethod
+    def get_java_version(cls):
+        if cls.java_version is None:
+            cls.java_version = utils.get_java_version() or 0
+
+        return cls.java_version
+
+    def get_command(self, name: str, main_args: list[str], jvm_args: list[str] = None):
+        """
+        Returns java command to run <main_args>.
+
+        Parameters:
+            name: str, name of the AppCDS archive
+            main_args: list of str, for eg. ["-jar", "ffdec.jar", ...]
+            jvm_args: list of str, additional JVM arguments
+
+        Returns:
+            (cmd, dump_path): tuple of list and Path, dump_path is the path
+                of the AppCDS archive that is written when the JVM exits or None
+        """
+
+        cmd = ["java", *self.jvm_args, *(jvm_args or []), "-Djna.nosys=true"]
+        dump_path = None
+
+        if self.class_data_sharing and self.get_java_version() >= 13:
+            archive_path = self.cache_path / f"{name}-java{self.get_java_version()}.jsa"
+
+            if archive_path.is_file():
+                cmd.append(f"-XX:SharedArchiveFile={archive_path}")
+            else:
+                # Every JVM dumps to its own file to avoid
+                # concurrent writes to the final archive
+                os.makedirs(self.cache_path, exist_ok=True)
+                dump_path = archive_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+                cmd.append(f"-XX:ArchiveClassesAtExit={dump_path}")
+
+        cmd += main_args
+
+        return cmd, dump_path
+
+    def finish(self, dump_path: Path):
+        """
+        Moves AppCDS archive dumped by an exited JVM
+        to its final path if there is none yet.
+        """
+
+        if dump_path is None or not dump_path.is_file():
+            return
+
+        archive_path = dump_path.with_suffix("").with_suffix(".jsa")
+
+        if archive_path.is_file():
+            os.remove(dump_path)
+        else:
+            os.replace(dump_path, archive_path)
+
+    @staticmethod
+    def get_env():
+        env = os.environ.copy()
+
+        # Hide VLC error output
+        env["VLC_VERBOSE"] = "-1"
+
+        return env
+
+    @staticmethod
+    def get_popen_kwargs():
+        """
+        Returns keyword arguments for starting java with subprocess.
+        """
+
+        return {
+            "env": JavaLauncher.get_env(),
+            "creationflags": utils.get_creation_flags(),
+        }
+
+
+class XMLCache:
+    """
+    Persistent, content-addressed cache for SWF to XML conversions.
+
+    Keys are SHA-256 hashes of the SWF bytes, the FFDec jar and the
+    conversion command. XMLs are stored gzip-compressed and the least
+    recently used entries are removed if the cache exceeds its size limit.
+    """
+
+    COMMAND = "-swf2xml"
+
+    def __init__(self, cache_path: Path, max_size: int, jar_path: Path = JavaLauncher.jar_path):
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.jar_path = jar_path
+
+        self._jar_hash: str = None
+
+    def __repr__(self):
+        return "XMLCache"
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    @staticmethod
+    def hash_file(filepath: Path):
+        with filepath.open("rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+
+    @property
+    def jar_hash(self):
+        """
+        Hash of the FFDec jar, so that updating FFDec invalidates the cache.
+        """
+
+        if self._jar_hash is None:
+            self._jar_hash = self.hash_file(self.jar_path) if self.jar_path.is_file() else ""
+
+        return self._jar_hash
+
+    def get_key(self, swf_path: Path, *extra: str):
+        """
+        Returns cache key for converting <swf_path>.
+
+        Parameters:
+            swf_path: Path, SWF file to convert
+            extra: str, additional data that changes the conversion result
+        """
+
+        key = hashlib.sha256()
+        key.update(self.jar_hash.encode())
+        key.update(self.COMMAND.encode())
+        key.update(self.hash_file(swf_path).encode())
+
+        for data in extra:
+            key.update(b"\0" + data.encode())
+
+        return key.hexdigest()
+
+    def get_path(self, key: str):
+        return self.cache_path / key[:2] / f"{key}.xml.gz"
+
+    def get(self, key: str, xml_path: Path):
+        """
+        Decompresses cached XML for <key> to <xml_path>.
+
+        Returns:
+            found: bool, True if there was a cached XML
+        """
+
+        entry_path = self.get_path(key)
+
+        if not entry_path.is_file():
+            return False
+
+        try:
+            with gzip.open(entry_path, "rb") as src, xml_path.open("wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        except (OSError, EOFError):
+            # Broken entry, convert again
+            entry_path.unlink(missing_ok=True)
+            return False
+
+        # Mark entry as recently used
+        os.utime(entry_path)
+
+        return True
+
+    def set(self, key: str, xml_path: Path):
+        """
+        Stores compressed <xml_path> as cached XML for <key>.
+        """
+
+        entry_path = self.get_path(key)
+        os.makedirs(entry_path.parent, exist_ok=True)
+
+        # Write to temporary file to never leave incomplete entries
+        tmp_path = entry_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with xml_path.open("rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp_path, entry_path)
+
+    def prune(self):
+        """
+        Removes least recently used entries until
+        the cache is not larger than its size limit.
+        """
+
+        if not self.cache_path.is_dir():
+            return
+
+        entries = [
+            (entry_path, entry_path.stat())
+            for entry_path in self.cache_path.glob("*/*.xml.gz")
+        ]
+        entries.sort(key=lambda entry: entry[1].st_mtime_ns)
+
+        size = sum(stat.st_size for _, stat in entries)
+
+        for entry_path, stat in entries:
+            if size <= self.max_size:
+                break
+
+            entry_path.unlink(missing_ok=True)
+            size -= stat.st_size
+
+
+class FFDecWorker:
+    """
+    Long-lived FFDec process that keeps the JVM running
+    and executes commands sent to its stdin.
+
+    See assets/ffdec/FFDecWorker.java for the protocol.
+    """
+
+    source_path = (Path(".") / "assets" / "ffdec" / "FFDecWorker.java").resolve()
+
+    STATUS_PREFIX = "<<<FFDEC_WORKER_STATUS:"
+    STATUS_SUFFIX = ">>>"
+
+    process: subprocess.Popen = None
+    dump_path: Path = None
+    available: bool = True
+
+    def __init__(
+        self,
+        launcher: JavaLauncher,
+        log: logging.Logger,
+        cancel_event: threading.Event = None
+    ):
+        self.launcher = launcher
+        self.log = log
+        self.cancel_event = cancel_event
+
+    @property
+    def pid(self):
+        if self.is_running():
+            return self.process.pid
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _get_command(self):
+        java_version = self.launcher.get_java_version()
+
+        # The Java source launcher requires Java 11+
+        if java_version < 11:
+            return None, None
+
+        jvm_args = []
+
+        # Java 18+ only allows security managers when enabled explicitly
+        # and Java 24+ does not support them at all
+        if 12 <= java_version < 24:
+            jvm_args.append("-Djava.security.manager=allow")
+
+        return self.launcher.get_command(
+            "ffdec-worker",
+            ["-cp", str(self.launcher.jar_path), str(self.source_path)],
+            jvm_args
+        )
+
+    def start(self):
+        """
+        Starts worker process. Marks worker as unavailable
+        if it fails to start.
+
+        Returns:
+            started: bool
+
+        Raises:
+            errors.CancelledError: if <cancel_event> is set
+        """
+
+        cmd, self.dump_path = self._get_command()
+
+        if cmd is None:
+            self.log.warning("FFDec worker requires Java 11 or newer!")
+            self.available = False
+            return False
+
+        self.log.debug("Starting FFDec worker...")
+
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf8",
+            errors="ignore",
+            cwd=self.launcher.jar_path.parent,
+            **self.launcher.get_popen_kwargs()
+        )
+
+        # Worker may have been started while cancelling and missed by it
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.process.kill()
+            self.stop()
+            raise errors.CancelledError("FFDec worker was started after cancel!")
+
+        status, output = self._read_output()
+
+        # Without exit guard the worker would exit and be compiled
+        # and started again after most commands, which is slower
+        # than running every command with its own FFDec process
+        if status == "READY:NOGUARD":
+            self.log.info("FFDec worker is not supported by this Java version.")
+            self.stop()
+            self.available = False
+            return False
+
+        if status != "READY":
+            self.log.warning(f"Failed to start FFDec worker:\n{output}")
+            self.stop()
+            self.available = False
+            return False
+
+        self.log.debug(f"FFDec worker started with pid {self.process.pid}.")
+
+        return True
+
+    def _read_output(self, process: subprocess.Popen = None):
+        output = ""
+
+        for line in (process or self.process).stdout:
+            # Status follows output without line break on the same line
+            index = line.find(self.STATUS_PREFIX)
+
+            if index != -1:
+                output += line[:index]
+                status = line[index:].strip()[len(self.STATUS_PREFIX):-len(self.STATUS_SUFFIX)]
+                return status, output
+
+            output += line
+
+        # Worker exited without status
+        return None, output
+
+    def execute(self, args: list[str]):
+        """
+        Executes FFDec command with <args> in running worker.
+        If the worker crashes during the command, its
+        exit code is returned and it has to be restarted
+        with `start` before the next command.
+
+        Returns:
+            (returncode, output): tuple of int and str
+        """
+
+        # Worker may be stopped by another thread during the command
+        process = self.process
+
+        if process is None:
+            raise errors.FFDecError("FFDec worker is not running!")
+
+        process.stdin.write("\t".join(args) + "\n")
+        process.stdin.flush()
+
+        status, output = self._read_output(process)
+
+        if status is None:
+            returncode = process.wait()
+            self.process = None
+            self.launcher.finish(self.dump_path)
+
+            self.log.debug(f"FFDec worker exited with code {returncode}.")
+
+            return returncode, output
+
+        return int(status), output
+
+    def stop(self):
+        """
+        Stops worker process.
+        """
+
+        process = self.process
+
+        if process is None:
+            return
+
+        # Worker exits when its stdin is closed
+        try:
+            process.stdin.close()
+            process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+
+        self.process = None
+        self.launcher.finish(self.dump_path)
+
+
 class FFDec:
     """
     Class for FFDec commandline interface.
+
+    Commands are executed in a persistent FFDecWorker
+    if possible and else with one FFDec process per command.
     """
 
-    bin_path = (Path(".") / "assets" / "ffdec" / "ffdec.bat").resolve()
     swf_path = None
     pid: int = None
-
-    def __init__(self, swf_path: Path, app: MainApp):
+    worker: FFDecWorker = None
+
+    def __init__(
+        self,
+        swf_path: Path,
+        app: MainApp,
+        use_worker: bool = True,
+        launcher: JavaLauncher = None,
+        cancel_event: threading.Event = None
+    ):
         self.app = app
 
         self.log = logging.getLogger(self.__repr__())
-        self.log.addHandler(self.app.log_str)
+        # Interfaces share their logger, add handler only once
+        if self.app.log_str not in self.log.handlers:
+            self.log.addHandler(self.app.log_str)
         self.log.setLevel(self.app.log.level)
 
         self.swf_path = swf_path
+        self.launcher = launcher if launcher is not None else JavaLauncher()
+        self.cancel_event = cancel_event
+
+        if use_worker:
+            self.worker = FFDecWorker(self.launcher, self.log, cancel_event)
 
     def __repr__(self):
         return "FFDecInterface"
 
-    def _exec_command(self, args: str):
-        cmd = f""""{self.bin_path}" {args}"""
+    def close(self):
+        """
+        Stops FFDec worker if running.
+        """
+
+        if self.worker is not None:
+            self.worker.stop()
+
+        self.pid = None
+
+    def kill(self):
+        """
+        Kills running FFDec processes and their children.
+        Used to cancel commands, together with <cancel_event>.
+        """
+
+        pids = {self.pid}
+
+        # Worker has no pid here yet while it starts
+        if self.worker is not None:
+            process = self.worker.process
+            if process is not None:
+                pids.add(process.pid)
+
+        for pid in pids - {None}:
+            utils.kill_child_process(pid)
+            self.log.info(f"Killed FFDec with pid {pid}.")
+
+    def check_cancelled(self):
+        """
+        Raises errors.CancelledError if <cancel_event> is set.
+        """
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise errors.CancelledError("FFDec command was cancelled!")
+
+    def _run_command(self, args: list[str]):
+        """
+        Runs FFDec command with <args>.
+
+        Returns:
+            (returncode, output, cmd): tuple of int, str and str
+
+        Raises:
+            errors.CancelledError: if <cancel_event> is set
+                before or during the command
+        """
+
+        self.check_cancelled()
+
+        # Arguments are sent to the worker as one line separated by tabs
+        if (self.worker is not None
+            and self.worker.available
+            and not any(("\t" in arg) or ("\n" in arg) for arg in args)
+            and (self.worker.is_running() or self.worker.start())):
+            self.pid = self.worker.pid
+
+            try:
+                returncode, output = self.worker.execute(args)
+            except (OSError, ValueError, errors.FFDecError):
+                # Worker was stopped by a cancel before the command
+                self.check_cancelled()
+                raise
+
+            # Keep pid of idle worker so that it can be killed on cancel
+            self.pid = self.worker.pid
+
+            # Worker was killed during the command
+            self.check_cancelled()
+
+            return returncode, output, subprocess.list2cmdline(args)
+
+        # Worker may have failed to start because it was killed
+        self.check_cancelled()
+
+        cmd, dump_path = self.launcher.get_command(
+            "ffdec",
+            ["-jar", str(self.launcher.jar_path), *args]
+        )
 
         output = ""
 
         with subprocess.Popen(
             cmd,
-            shell=True,
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
             encoding="utf8",
-            errors="ignore"
+            errors="ignore",
+            **self.launcher.get_popen_kwargs()
         ) as process:
             self.pid = process.pid
+
+            # Process may have been started while cancelling and missed by it
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                process.kill()
+
             for line in process.stdout:
                 output += line
 
         self.pid = None
+        self.launcher.finish(dump_path)
+
+        self.check_cancelled()
 
-        if process.returncode:
+        return process.returncode, output, subprocess.list2cmdline(cmd)
+
+    def _exec_command(self, args: list[str]):
+        returncode, output, cmd = self._run_command(args)
+
+        if returncode:
             self.log.error(f"FFDec Command:\n{cmd}")
             self.log.error(f"FFDec Output:\n{output}")
             raise errors.FFDecError("Failed to execute FFDec command! Check output above!")
@@ -72,14 +598,14 @@ class FFDec:
 
         self.log.info(f"Exporting shapes...")
 
-        cmd = f"""\
--format shape:{format} \
--selectid {','.join(shape_ids)} \
--export shape "{outpath}" \
-"{self.swf_path}"\
-"""
+        args = [
+            "-format", f"shape:{format}",
+            "-selectid", ",".join(shape_ids),
+            "-export", "shape", str(outpath),
+            str(self.swf_path)
+        ]
 
-        self._exec_command(cmd)
+        self._exec_command(args)
 
         self.log.info(f"Shapes exported to '{outpath}'.")
 
@@ -105,13 +631,14 @@ class FFDec:
             for index in indexes:
                 cmd = f"""{index}\n{shape}\n"""
                 cmds.append(cmd)
-        cmdfile = self.swf_path.parent / "shapes.txt"
+        # Named after the SWF since SWFs in one folder can be patched concurrently
+        cmdfile = self.swf_path.parent / f"{self.swf_path.stem}_shapes.txt"
         with open(cmdfile, "w", encoding="utf8") as file:
             file.writelines(cmds)
 
-        cmd = f"""-replace "{self.swf_path}" "{self.swf_path}" "{cmdfile.resolve()}" """
+        args = ["-replace", str(self.swf_path), str(self.swf_path), str(cmdfile.resolve())]
 
-        self._exec_command(cmd)
+        self._exec_command(args)
 
         self.log.info("Shapes patched.")
 
@@ -128,13 +655,38 @@ class FFDec:
         if out_path.is_file():
             os.remove(out_path)
 
-        args = f"""-swf2xml "{self.swf_path}" "{out_path}" """
+        args = ["-swf2xml", str(self.swf_path), str(out_path)]
         self._exec_command(args)
 
         self.log.info("Converted to XML.")
 
         return out_path
     
+    def convert_swf2xml(self, swf_path: Path, xml_path: Path):
+        """
+        Converts <swf_path> to <xml_path> and logs output if it fails.
+
+        Returns:
+            converted: bool, True if conversion succeeded
+        """
+
+        self.log.debug(f"File: {swf_path}")
+
+        if xml_path.is_file():
+            os.remove(xml_path)
+
+        args = ["-swf2xml", str(swf_path), str(xml_path)]
+        returncode, output, cmd = self._run_command(args)
+
+        converted = not returncode and xml_path.is_file()
+
+        if not converted:
+            self.log.error(f"Failed to convert '{swf_path.name}'!")
+            self.log.error(f"FFDec Command:\n{cmd}")
+            self.log.error(f"FFDec Output:\n{output}")
+
+        return converted
+
     def xml2swf(self, xml_file: Path):
         """
         Converts XML file to SWF file and returns file path.
@@ -148,10 +700,134 @@ class FFDec:
         if out_path.is_file():
             os.remove(out_path)
 
-        args = f"""-xml2swf "{xml_file}" "{out_path}" """
+        args = ["-xml2swf", str(xml_file), str(out_path)]
         self._exec_command(args)
 
         self.log.info("Converted to SWF.")
 
         return out_path
 
+
+
+class FFDecPool:
+    """
+    Bounded pool of FFDec interfaces that run commands concurrently.
+    Every interface has its own FFDec process and pid.
+    """
+
+    def __init__(
+        self,
+        app: MainApp,
+        size: int,
+        launcher: JavaLauncher = None,
+        cancel_event: threading.Event = None
+    ):
+        self.app = app
+        self.size = max(size, 1)
+        # Shared by all interfaces, no command starts once it is set
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+
+        self.log = logging.getLogger(self.__repr__())
+        self.log.addHandler(self.app.log_str)
+        self.log.setLevel(self.app.log.level)
+
+        self.interfaces = [
+            FFDec(None, app, launcher=launcher, cancel_event=self.cancel_event)
+            for _ in range(self.size)
+        ]
+
+        # Interfaces that are not executing a command
+        self.idle_interfaces: queue.Queue[FFDec] = queue.Queue()
+        for interface in self.interfaces:
+            self.idle_interfaces.put(interface)
+
+    def __repr__(self):
+        return "FFDecPool"
+
+    @property
+    def pids(self):
+        """
+        Pids of all running FFDec processes.
+        """
+
+        return [
+            interface.pid
+            for interface in self.interfaces
+            if interface.pid is not None
+        ]
+
+    def close(self):
+        """
+        Stops FFDec processes of all interfaces.
+        """
+
+        for interface in self.interfaces:
+            interface.close()
+
+    def cancel(self):
+        """
+        Cancels running and queued commands and kills all FFDec processes.
+        """
+
+        self.cancel_event.set()
+
+        for interface in self.interfaces:
+            interface.kill()
+
+        self.close()
+
+    @contextmanager
+    def get_interface(self):
+        """
+        Waits for an idle interface and reserves it
+        for the duration of the with block.
+        """
+
+        interface = self.idle_interfaces.get()
+
+        try:
+            yield interface
+        finally:
+            self.idle_interfaces.put(interface)
+
+    def swf2xml(self, swf_path: Path, xml_path: Path):
+        """
+        Converts <swf_path> to <xml_path> with the next idle interface.
+
+        Returns:
+            converted: bool, True if conversion succeeded
+        """
+
+        with self.get_interface() as interface:
+            return interface.convert_swf2xml(swf_path, xml_path)
+
+    def swf2xmls(self, files: list[tuple[Path, Path]]):
+        """
+        Converts multiple SWF files to XML files concurrently.
+        A failed conversion does not abort the others.
+
+        Params:
+            files: list of tuples with swf path and xml path
+
+        Returns:
+            results: dictionary, keys are swf paths and values are True if converted
+        """
+
+        self.log.info(
+            f"Converting {len(files)} SWF(s) to XML with up to {self.size} FFDec process(es)..."
+        )
+
+        with ThreadPoolExecutor(self.size, thread_name_prefix="FFDec") as executor:
+            futures = {
+                swf_path: executor.submit(self.swf2xml, swf_path, xml_path)
+                for swf_path, xml_path in files
+            }
+
+        results: dict[Path, bool] = {
+            swf_path: future.result()
+            for swf_path, future in futures.items()
+        }
+
+        self.log.info(f"Converted {sum(results.values())}/{len(files)} SWF(s) to XML.")
+
+        return results
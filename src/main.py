@@ -272,14 +272,11 @@ here</a>.\
             self.exit()
 
     def cancel_creator(self):
+        # Stops the creator's worker threads and FFDec processes,
+        # which keep running when only the creator thread is terminated
+        self.patch_creator.cancel()
         self.creator_thread.terminate()
 
-        if self.patch_creator.ffdec_interface is not None:
-            if self.patch_creator.ffdec_interface.pid is not None:
-                utils.kill_child_process(self.patch_creator.ffdec_interface.pid)
-                self.log.info(f"Killed FFDec with pid {self.patch_creator.ffdec_interface.pid}.")
-                self.patch_creator.ffdec_interface.pid = None
-
         if self.patch_creator.tmpdir is not None:
             if self.patch_creator.tmpdir.is_dir():
                 shutil.rmtree(self.patch_creator.tmpdir)
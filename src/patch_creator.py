@@ -6,23 +6,42 @@ Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
 """
 
 
+import hashlib
 import logging
 import os
 import shutil
 import tempfile as tmp
+import threading
 import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import time
+from typing import Any, Callable
 import jstyleson as json
 import bsa_extractor as bsa
 
 import errors
 import ffdec
+import swf
+import vfs
+import xml_backend
 from main import MainApp
 
 
 PATCHER_CONFIG: dict[str, list[str] | str] = json.loads((Path(".").resolve() / "assets" / "config.json").read_text())
 FILE_BLACKLIST: list[str] = PATCHER_CONFIG.get("file_blacklist", [])
+BSA_DECOMPRESSION_WORKERS: int = PATCHER_CONFIG.get("bsa_decompression_workers", 0)
+FFDEC_MAX_MEMORY: str = PATCHER_CONFIG.get("ffdec_max_memory", "2048m")
+FFDEC_JVM_ARGS: list[str] = PATCHER_CONFIG.get("ffdec_jvm_args", [])
+FFDEC_CLASS_DATA_SHARING: bool = PATCHER_CONFIG.get("ffdec_class_data_sharing", True)
+FFDEC_WORKERS: int = PATCHER_CONFIG.get("ffdec_workers", 0) or min(4, os.cpu_count() or 1)
+COMPARE_WORKERS: int = PATCHER_CONFIG.get("compare_workers", 1)
+XML_CACHE_SIZE: int = PATCHER_CONFIG.get("xml_cache_size", 1024)
+PARSED_XML_CACHE_SIZE: int = PATCHER_CONFIG.get("parsed_xml_cache_size", 512)
+STREAMING_COMPARE_SIZE: int = PATCHER_CONFIG.get("streaming_compare_size", 256)
+NATIVE_SHAPE_DIFF: bool = PATCHER_CONFIG.get("native_shape_diff", False)
+XML_BACKEND: xml_backend.XMLBackend = xml_backend.get_backend(PATCHER_CONFIG.get("xml_backend", "compact"))
+DEBUG_STAGE_AT_A_TIME: bool = PATCHER_CONFIG.get("debug_stage_at_a_time", False)
 EXPORT_FORMAT: str = PATCHER_CONFIG.get("export_format", "svg")
 CREATION_WHITELIST: list[str] = PATCHER_CONFIG.get("creation_whitelist", [])
 LIST_TAGS: list[str] = PATCHER_CONFIG.get("list_tags", [])
@@ -32,110 +51,1104 @@ TAG_BLACKLIST: list[str] = PATCHER_CONFIG.get("tag_blacklist", [])
 ATTR_BLACKLIST: list[str] = PATCHER_CONFIG.get("attr_blacklist", [])
 SHAPE_TYPES: list[str] = PATCHER_CONFIG.get("shape_types", [])
 
+CACHE_PATH: Path = Path(".").resolve() / "cache"
+MANIFEST_PATH: Path = CACHE_PATH / "manifest.json"
+
+# Config keys that change the created patch data
+MANIFEST_CONFIG_KEYS: list[str] = [
+    "export_format",
+    "creation_whitelist",
+    "list_tags",
+    "filter_whitelist",
+    "type_blacklist",
+    "tag_blacklist",
+    "attr_blacklist",
+    "shape_types",
+    "native_shape_diff",
+]
+
+
+class XMLTreeCache:
+    """
+    Thread-safe cache of parsed XML documents.
+
+    Documents are parsed once and reused until they are invalidated,
+    rewritten on disk or evicted because the cache exceeds its size limit.
+    The least recently used documents are evicted first and the size
+    of a document is the size of its XML file.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+
+        # Paths and their parsed documents with size and modification time
+        self.trees: OrderedDict[Path, tuple[ET.ElementTree, int, int]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "XMLTreeCache"
+
+    def _remove(self, xml_path: Path):
+        entry = self.trees.pop(xml_path, None)
+
+        if entry is not None:
+            self.size -= entry[1]
+
+    def get(self, xml_path: Path):
+        """
+        Returns parsed document of <xml_path>.
+        The document must not be modified since it is shared.
+        """
+
+        stat = xml_path.stat()
+
+        with self.lock:
+            entry = self.trees.get(xml_path)
+
+            if entry is not None and entry[1:] == (stat.st_size, stat.st_mtime_ns):
+                self.trees.move_to_end(xml_path)
+                return entry[0]
+
+        tree = XML_BACKEND.parse(xml_path)
+
+        with self.lock:
+            self._remove(xml_path)
+
+            if stat.st_size <= self.max_size:
+                self.trees[xml_path] = (tree, stat.st_size, stat.st_mtime_ns)
+                self.size += stat.st_size
+
+            while self.size > self.max_size:
+                _, (_, size, _) = self.trees.popitem(last=False)
+                self.size -= size
+
+        return tree
+
+    def pop(self, xml_path: Path):
+        """
+        Returns parsed document of <xml_path> and removes it from the cache,
+        so that it can be modified.
+        """
+
+        tree = self.get(xml_path)
+        self.invalidate(xml_path)
+
+        return tree
+
+    def invalidate(self, xml_path: Path):
+        """
+        Removes document of <xml_path>, for eg. before it is rewritten.
+        """
+
+        with self.lock:
+            self._remove(xml_path)
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+            self.size = 0
+
+
+class ElementIndex:
+    """
+    Resolves the XPaths built by PatchCreator.compare_elements in the
+    original tree with the same result as ElementTree's find.
+
+    Matches of every XPath are stored, so resolving a child's XPath only
+    looks up the children of its parent's matches in a dictionary
+    instead of walking the whole tree again.
+
+    If a patched root is given, subtree hashes of both trees are used
+    to skip patched subtrees that are identical to their original.
+    """
+
+    def __init__(self, root: ET.Element, patched_root: ET.Element = None, root_tag: str = None):
+        # XPaths and their matches in document order
+        self.paths: dict[str, list[ET.Element]] = {".": [root]}
+
+        # Children of every parent by tag and filter attributes
+        self.children: dict[ET.Element, dict[tuple, dict[tuple, list[ET.Element]]]] = {}
+
+        self.root_tag = root_tag
+        self.hashes: dict[ET.Element, int] = {}
+        self.skippable: dict[ET.Element, bool] = {}
+
+        if patched_root is not None:
+            PatchCreator.get_subtree_hashes(root, self.hashes)
+            PatchCreator.get_subtree_hashes(patched_root, self.hashes)
+
+    def __repr__(self):
+        return "ElementIndex"
+
+    def get_children(self, parent: ET.Element, tag: str, keys: tuple[str]):
+        """
+        Returns children of <parent> with <tag> grouped by their values of <keys>.
+        Children that do not have all <keys> are left out.
+        """
+
+        parent_children = self.children.setdefault(parent, {})
+        children = parent_children.get((tag, keys))
+
+        if children is None:
+            children = {}
+
+            for child in parent:
+                if child.tag != tag:
+                    continue
+
+                values = tuple(child.get(key) for key in keys)
+
+                if None not in values:
+                    children.setdefault(values, []).append(child)
+
+            parent_children[(tag, keys)] = children
+
+        return children
+
+    def add_path(self, xpath: str, parent_xpath: str, tag: str, filters: list[tuple[str, str]]):
+        """
+        Resolves <xpath> that selects children of <parent_xpath>
+        with <tag> and attributes <filters>.
+        """
+
+        if xpath in self.paths:
+            return
+
+        filters = sorted(filters)
+        keys = tuple(key for key, _ in filters)
+        values = tuple(value for _, value in filters)
+
+        matches: list[ET.Element] = []
+        for parent in self.paths[parent_xpath]:
+            matches += self.get_children(parent, tag, keys).get(values, [])
+
+        self.paths[xpath] = matches
+
+    def find(self, xpath: str):
+        """
+        Returns first match of <xpath> or None.
+        """
+
+        matches = self.paths[xpath]
+
+        return matches[0] if matches else None
+
+    def is_unchanged(self, patched_element: ET.Element, original_element: ET.Element):
+        """
+        Checks if comparing <patched_element> with <original_element>
+        is known to result in no differences.
+        """
+
+        patched_hash = PatchCreator.get_hash(patched_element, self.hashes)
+
+        return (
+            patched_hash is not None
+            and patched_hash == PatchCreator.get_hash(original_element, self.hashes)
+            and PatchCreator.is_skippable(
+                patched_element,
+                self.hashes,
+                self.root_tag,
+                self.skippable
+            )
+        )
+
+
+class XMLStream:
+    """
+    Streams an FFDec XML with iterparse.
+
+    Iterating yields every element at the third level together with
+    its parent, once it is completely parsed. Children of the tags element
+    are removed from the tree after they have been consumed, so that only
+    the rest of the document is kept in memory. The tags element is available
+    while streaming and the rest of the document once the stream is exhausted.
+    """
+
+    def __init__(self, xml_path: Path):
+        self.xml_path = xml_path
+        self.root: ET.Element = None
+        self.tags: ET.Element = None
+
+    def __repr__(self):
+        return "XMLStream"
+
+    def __iter__(self):
+        depth = 0
+        root: ET.Element = None
+        parent: ET.Element = None
+        self.root = self.tags = None
+
+        for event, element in XML_BACKEND.iterparse(self.xml_path, ("start", "end")):
+            if event == "start":
+                depth += 1
+
+                if depth == 1:
+                    root = element
+                elif depth == 2:
+                    parent = element
+
+                    if element.tag == "tags":
+                        if self.tags is not None:
+                            raise errors.UnsupportedXMLError("XML has more than one tags element!")
+                        self.tags = element
+
+                continue
+
+            if depth == 3:
+                yield parent, element
+
+                if parent is self.tags:
+                    self.tags.remove(element)
+
+            depth -= 1
+
+        self.root = root
+
+
+class StreamingComparison:
+    """
+    Compares FFDec XMLs that are too large to be parsed completely
+    by streaming the children of their tags element.
+
+    Only an index of the original tags and the patched tags that can
+    have differences are kept in memory:
+    1. The original is streamed to index tag, filter attributes and
+       subtree hash of every tag.
+    2. The patched XML is streamed and tags whose first original match
+       has the same hash are dropped, since they have no differences.
+    3. The original is streamed again to collect the tags that can be
+       matched by the remaining patched tags.
+
+    The remaining tags are compared with PatchCreator.compare_elements,
+    which gives the same result as comparing the complete documents.
+    """
+
+    def __init__(self, original_xml_path: Path, patched_xml_path: Path):
+        self.original_xml_path = original_xml_path
+        self.patched_xml_path = patched_xml_path
+
+        # Original tags of every frame as (position, tag, filters, hash)
+        # Frame 0 contains all tags if the XML is not split into frames
+        self.frames: dict[int, list[tuple[int, str, dict[str, str], int]]] = {}
+        self.frame_count = 0
+        self.split = False
+
+        # Original tags of every frame by tag and filter attributes
+        self.matches: dict[tuple, dict[tuple, list[tuple]]] = {}
+
+    def __repr__(self):
+        return "StreamingComparison"
+
+    @staticmethod
+    def is_frame_delimiter(element: ET.Element):
+        return element.tag == "item" and element.get("type") == "ShowFrameTag"
+
+    @staticmethod
+    def is_transparent(element: ET.Element, root: str = "swf"):
+        """
+        Checks if compare_elements searches children of <element>
+        at the XPath of its parent.
+        """
+
+        return (
+            element.get("type", "item") in TYPE_BLACKLIST
+            or element.tag in TAG_BLACKLIST
+            or element.tag == root
+        )
+
+    @staticmethod
+    def get_filters(element: ET.Element):
+        return {
+            key: value
+            for key, value in element.items()
+            if key in FILTER_WHITELIST
+        }
+
+    @staticmethod
+    def check_skeleton(stream: XMLStream):
+        """
+        Checks that the document of <stream> without tags can be compared
+        with the same result as the complete document.
+        """
+
+        if stream.root is None or stream.root.tag != "swf":
+            raise errors.UnsupportedXMLError("XML has no swf root element!")
+
+        if sum(map(StreamingComparison.is_frame_delimiter, stream.root)) > 1:
+            raise errors.UnsupportedXMLError("XML has frames outside of tags!")
+
+        # Dropped tags must not change the result of their parents
+        if stream.tags is not None and stream.tags.attrib:
+            raise errors.UnsupportedXMLError("Tags element has attributes!")
+
+        if "tags" not in LIST_TAGS or "subTags" not in LIST_TAGS:
+            raise errors.UnsupportedXMLError("tags and subTags are not in list_tags!")
+
+    def iter_frames(self, stream: XMLStream, delimiters: list[int]):
+        """
+        Yields (frame_id, position, tag) for tags in <stream>
+        with frames split like in the original.
+        Tags are split recursively and frame delimiters are counted in <delimiters>.
+        """
+
+        position = 0
+
+        for parent, element in stream:
+            if parent is not stream.tags:
+                continue
+
+            PatchCreator.split_frames(element)
+            position += 1
+
+            if self.is_frame_delimiter(element):
+                delimiters[0] += 1
+
+            if not self.split:
+                yield 0, position, element
+
+            # Frame delimiters are replaced by frame elements
+            elif element.get("type") != "ShowFrameTag":
+                yield delimiters[0] + 1, position, element
+
+    def index_original(self):
+        """
+        Indexes every tag of the original XML.
+        """
+
+        stream = XMLStream(self.original_xml_path)
+        records: list[tuple[int, tuple]] = []
+        delimiters = [0]
+
+        # The original is indexed unsplit and then split
+        # by the number of frame delimiters
+        for _, position, element in self.iter_frames(stream, delimiters):
+            hashes = PatchCreator.get_subtree_hashes(element)
+            record = (position, element.tag, self.get_filters(element), hashes[element])
+            frame_id = delimiters[0] + 1 - self.is_frame_delimiter(element)
+            records.append((frame_id, record, element.get("type") == "ShowFrameTag"))
+
+        self.check_skeleton(stream)
+
+        self.frame_count = delimiters[0]
+        self.split = self.frame_count > 1
+
+        for frame_id, record, is_frame_tag in records:
+            if not self.split:
+                self.frames.setdefault(0, []).append(record)
+
+            # Tags after the last frame delimiter are dropped
+            elif not is_frame_tag and frame_id <= self.frame_count:
+                self.frames.setdefault(frame_id, []).append(record)
+
+    def get_matches(self, frame_id: int, tag: str, filters: dict[str, str]):
+        """
+        Returns original tags in frame <frame_id> with <tag>
+        that have all attributes of <filters>, in document order.
+        """
+
+        keys = tuple(sorted(filters))
+        values = tuple(filters[key] for key in keys)
+
+        matches = self.matches.get((frame_id, tag, keys))
+
+        if matches is None:
+            matches = {}
+
+            for record in self.frames.get(frame_id, []):
+                if record[1] != tag:
+                    continue
+
+                record_values = tuple(record[2].get(key) for key in keys)
+
+                if None not in record_values:
+                    matches.setdefault(record_values, []).append(record)
+
+            self.matches[(frame_id, tag, keys)] = matches
+
+        return matches.get(values, [])
+
+    def get_queries(self, element: ET.Element):
+        """
+        Yields tag and filters that compare_elements
+        searches at the XPath of <element>'s parent.
+        """
+
+        if self.is_transparent(element):
+            for child in element:
+                yield from self.get_queries(child)
+        else:
+            yield element.tag, self.get_filters(element)
+
+    def collect_patched(self):
+        """
+        Collects patched tags that can have differences to their original.
+
+        Returns:
+            (stream, frames, frame_count): exhausted XMLStream, tags by frame
+                and number of frames
+        """
+
+        stream = XMLStream(self.patched_xml_path)
+        frames: dict[int, list[ET.Element]] = {}
+        delimiters = [0]
+
+        for frame_id, _, element in self.iter_frames(stream, delimiters):
+            hashes = PatchCreator.get_subtree_hashes(element)
+
+            if not self.is_transparent(element):
+                matches = self.get_matches(frame_id, element.tag, self.get_filters(element))
+
+                if (matches
+                    and matches[0][3] == hashes[element]
+                    and PatchCreator.is_skippable(element, hashes, "swf", {})):
+                    continue
+
+            frames.setdefault(frame_id, []).append(element)
+
+        self.check_skeleton(stream)
+
+        if (delimiters[0] > 1) != self.split:
+            raise errors.UnsupportedXMLError("Only one of the XMLs is split into frames!")
+
+        # Tags after the last frame delimiter are dropped
+        if self.split:
+            for frame_id in list(frames):
+                if frame_id > delimiters[0]:
+                    frames.pop(frame_id)
+
+        return stream, frames, delimiters[0]
+
+    def collect_original(self, positions: dict[int, int]):
+        """
+        Collects original tags at <positions>.
+
+        Returns:
+            (stream, frames): exhausted XMLStream and tags by frame
+        """
+
+        stream = XMLStream(self.original_xml_path)
+        frames: dict[int, list[ET.Element]] = {}
+        delimiters = [0]
+
+        for _, position, element in self.iter_frames(stream, delimiters):
+            if position in positions:
+                frames.setdefault(positions[position], []).append(element)
+
+        self.check_skeleton(stream)
+
+        return stream, frames
+
+    def build_tree(self, stream: XMLStream, frames: dict[int, list[ET.Element]], frame_count: int):
+        """
+        Inserts <frames> into the tags element of <stream>'s document
+        like PatchCreator.split_frames.
+        """
+
+        root = PatchCreator.split_frames(stream.root)
+
+        if stream.tags is None:
+            return root
+
+        if not self.split:
+            stream.tags.extend(frames.get(0, []))
+            return root
+
+        for frame_id in range(1, frame_count + 1):
+            frame = stream.tags.makeelement("frame", {"frameId": str(frame_id)})
+            frame_subtags = frame.makeelement("subTags", {})
+            frame_subtags.extend(frames.get(frame_id, []))
+            frame.append(frame_subtags)
+            stream.tags.append(frame)
+
+        return root
+
+    def compare(self):
+        """
+        Compares the XMLs like PatchCreator.compare_elements.
+
+        Raises:
+            errors.UnsupportedXMLError: if the XMLs cannot be compared by streaming
+        """
+
+        self.index_original()
+
+        patched_stream, patched_frames, patched_frame_count = self.collect_patched()
+
+        # Original tags that can be matched by the remaining patched tags
+        positions: dict[int, int] = {}
+        for frame_id, elements in patched_frames.items():
+            for element in elements:
+                for tag, filters in self.get_queries(element):
+                    for record in self.get_matches(frame_id, tag, filters):
+                        positions[record[0]] = frame_id
+
+        self.matches.clear()
+
+        original_stream, original_frames = self.collect_original(positions)
+
+        original_root = self.build_tree(original_stream, original_frames, self.frame_count)
+        patched_root = self.build_tree(patched_stream, patched_frames, patched_frame_count)
+
+        return PatchCreator.compare_elements(original_root, patched_root, ".", "swf")
+
+    @staticmethod
+    def iter_shapes(xml_path: Path):
+        """
+        Yields shape items like PatchCreator.get_shapes in document order.
+        """
+
+        for _, element in XMLStream(xml_path):
+            if (element.tag == "item"
+                and "shapeId" in element.attrib
+                and element.get("type") in SHAPE_TYPES):
+                yield element
+
+    @staticmethod
+    def get_shape_changes(original_xml_path: Path, patched_xml_path: Path):
+        """
+        Compares shapes like PatchCreator.get_shape_changes
+        while only keeping shapes in memory that have a different hash.
+
+        Returns:
+            (different_shapes, added_shapes, removed_shapes): tuple of lists with shape ids
+        """
+
+        # Hash of first patched shape of every type and id
+        patched_hashes: dict[tuple[str, str], int] = {}
+        for patched_shape in StreamingComparison.iter_shapes(patched_xml_path):
+            key = (patched_shape.attrib["type"], patched_shape.attrib["shapeId"])
+
+            if key not in patched_hashes:
+                patched_hashes[key] = PatchCreator.get_subtree_hashes(patched_shape)[patched_shape]
+
+        # Original shapes by type as (shape id, original shape or None if unchanged)
+        original_shapes: dict[str, list[tuple[str, ET.Element]]] = {
+            shape_type: []
+            for shape_type in SHAPE_TYPES
+        }
+        removed_shapes: dict[str, list[str]] = {shape_type: [] for shape_type in SHAPE_TYPES}
+        original_keys: set[tuple[str, str]] = set()
+
+        for original_shape in StreamingComparison.iter_shapes(original_xml_path):
+            shape_id = original_shape.attrib["shapeId"]
+            shape_type = original_shape.attrib["type"]
+            key = (shape_type, shape_id)
+            original_keys.add(key)
+
+            if key not in patched_hashes:
+                removed_shapes[shape_type].append(shape_id)
+            elif PatchCreator.get_subtree_hashes(original_shape)[original_shape] == patched_hashes[key]:
+                original_shapes[shape_type].append((shape_id, None))
+            else:
+                original_shapes[shape_type].append((shape_id, original_shape))
+
+        # Patched shapes are only parsed again if an original shape has a different hash
+        changed_keys: set[tuple[str, str]] = {
+            (shape_type, shape_id)
+            for shape_type, shapes in original_shapes.items()
+            for shape_id, original_shape in shapes
+            if original_shape is not None
+        }
+        patched_shapes: dict[tuple[str, str], ET.Element] = {}
+        if changed_keys:
+            for patched_shape in StreamingComparison.iter_shapes(patched_xml_path):
+                key = (patched_shape.attrib["type"], patched_shape.attrib["shapeId"])
+
+                if key in changed_keys:
+                    patched_shapes.setdefault(key, patched_shape)
+
+        different_shapes: list[str] = [
+            shape_id
+            for shape_type in SHAPE_TYPES
+            for shape_id, original_shape in original_shapes[shape_type]
+            if original_shape is not None
+            and PatchCreator.check_if_different(
+                original_shape,
+                patched_shapes[(shape_type, shape_id)]
+            )
+        ]
+
+        added_shapes: list[str] = [
+            shape_id
+            for shape_type in SHAPE_TYPES
+            for key_type, shape_id in patched_hashes.keys()
+            if key_type == shape_type and (key_type, shape_id) not in original_keys
+        ]
+
+        return (
+            different_shapes,
+            added_shapes,
+            [shape_id for shape_type in SHAPE_TYPES for shape_id in removed_shapes[shape_type]]
+        )
+
 
 class PatchCreator:
     """
     Class for Patch Creator.
     """
 
-    original_mod_path: Path = None
-    patched_mod_path: Path = None
-    ffdec_interface: ffdec.FFDec = None
-    tmpdir: Path = None
-    patch_data: dict[Path, dict] = None
+    original_mod_path: Path = None
+    patched_mod_path: Path = None
+    ffdec_pool: ffdec.FFDecPool = None
+    executor: ThreadPoolExecutor = None
+    tmpdir: Path = None
+    patch_data: dict[Path, dict] = None
+    original_vfs: vfs.VirtualFileSystem = None
+
+    def __init__(self, app: MainApp, patched_mod_path: Path, original_mod_path: Path):
+        self.app = app
+        self.patched_mod_path = patched_mod_path
+        self.original_mod_path = original_mod_path
+
+        self.log = logging.getLogger(self.__repr__())
+        self.log.addHandler(self.app.log_str)
+        self.log.setLevel(self.app.log.level)
+
+        self.java_launcher = ffdec.JavaLauncher(
+            [f"-Xmx{FFDEC_MAX_MEMORY}", *FFDEC_JVM_ARGS],
+            FFDEC_CLASS_DATA_SHARING
+        )
+        self.xml_cache = ffdec.XMLCache(CACHE_PATH / "xml", XML_CACHE_SIZE * 1024 * 1024)
+        self.xml_trees = XMLTreeCache(PARSED_XML_CACHE_SIZE * 1024 * 1024)
+        self.replacement_keys: dict[Path, str] = {}
+        # FFDec pool is created by the first thread that needs it
+        self.ffdec_lock = threading.Lock()
+        # Limits parsing and comparing XMLs independently of FFDec
+        # since they hold the GIL and only add memory when run at once
+        self.compare_semaphore = threading.BoundedSemaphore(max(COMPARE_WORKERS, 1))
+        # Set by cancel, no step or FFDec command starts afterwards
+        self.cancel_event = threading.Event()
+
+        # Content hashes of patched and original SWFs
+        self.file_hashes: dict[Path, dict[str, str]] = {}
+        # Output files of SWFs reused from the last run
+        self.reused_files: dict[Path, list[str]] = {}
+
+        self.load_patch()
+
+    def __repr__(self):
+        return "PatchCreator"
+
+    def load_patch(self):
+        self.patch_data = {}
+
+        self.log.info("Loading patched mod...")
+
+        for swf_file in self.patched_mod_path.glob("**/*.swf"):
+            if swf_file.name in FILE_BLACKLIST:
+                continue
+            swf_file = swf_file.relative_to(self.patched_mod_path)
+            self.patch_data[swf_file] = {}
+            self.log.debug(f"Found '{swf_file}'.")
+
+        self.log.info(f"Loaded patched mod with {len(self.patch_data)} SWF file(s).")
+
+    def load_original_mod(self):
+        """
+        Indexes loose files and BSAs of original mod
+        and checks that every patched SWF exists in it.
+
+        Runs in the creator thread since indexing
+        many BSAs would block the window.
+        """
+
+        self.log.info("Loading original mod...")
+
+        index_cache = bsa.BSAIndexCache(CACHE_PATH / "bsa_index.json")
+        index_cache.load()
+
+        self.original_vfs = vfs.VirtualFileSystem(self.original_mod_path, index_cache)
+
+        index_cache.save()
+
+        self.log.info(
+            f"Loaded original mod with {len(self.original_vfs.files)} file(s) \
+and {len(self.original_vfs.archives)} BSA(s)."
+        )
+
+        for swf_file in self.patch_data.keys():
+            if not self.original_vfs.exists(swf_file):
+                raise errors.SWFFileNotFoundError(f"File '{swf_file}' not found in Original mod!")
+
+    def skip_unchanged_files(self):
+        """
+        Removes SWFs from the patch whose uncompressed content
+        is identical to the original SWF.
+        """
+
+        self.log.info("Checking for unchanged SWFs...")
+
+        unchanged_files: list[Path] = []
+
+        for swf_file in self.patch_data.keys():
+            try:
+                with (self.patched_mod_path / swf_file).open("rb") as file:
+                    patched_hash = swf.get_content_hash(file)
+
+                with self.original_vfs.open_file(swf_file) as file:
+                    original_hash = swf.get_content_hash(file)
+            except errors.InvalidSWFFileError:
+                # Let FFDec handle broken files
+                continue
+
+            if patched_hash == original_hash:
+                unchanged_files.append(swf_file)
+                self.log.debug(f"Skipped unchanged '{swf_file}'.")
+            else:
+                self.file_hashes[swf_file] = {
+                    "patched": patched_hash,
+                    "original": original_hash,
+                }
+
+        for swf_file in unchanged_files:
+            self.patch_data.pop(swf_file)
+
+        self.log.info(
+            f"Skipped {len(unchanged_files)} unchanged SWF(s), \
+{len(self.patch_data)} SWF(s) left to process."
+        )
+
+    def get_manifest_key(self):
+        """
+        Returns dictionary with mod paths, DICK version and
+        hash of the config keys that change the patch data.
+        """
+
+        config = {key: PATCHER_CONFIG.get(key) for key in MANIFEST_CONFIG_KEYS}
+        config_hash = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+        return {
+            "patched_mod_path": str(self.patched_mod_path),
+            "original_mod_path": str(self.original_mod_path),
+            "version": self.app.version,
+            "config_hash": config_hash,
+        }
+
+    def load_manifest(self):
+        """
+        Compares SWFs with the manifest of the last run and removes SWFs
+        with unchanged patched and original content from the patch
+        if their output files still exist in the output folder.
+        """
+
+        try:
+            manifest: dict = json.loads(MANIFEST_PATH.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return
+
+        if manifest.get("key") != self.get_manifest_key():
+            self.log.info("Mods or config changed since last run, processing all SWFs.")
+            return
+
+        output_folder = Path(".").resolve() / "Output"
+
+        for swf_file, file_hashes in self.file_hashes.items():
+            entry: dict = manifest["files"].get(swf_file.as_posix())
+
+            if entry is None or entry["hashes"] != file_hashes:
+                continue
+
+            if all((output_folder / output).is_file() for output in entry["outputs"]):
+                self.reused_files[swf_file] = entry["outputs"]
+
+        for swf_file in self.reused_files.keys():
+            self.patch_data.pop(swf_file)
+            self.log.debug(f"Reusing output of unchanged '{swf_file}'.")
+
+        self.log.info(
+            f"Reusing output of {len(self.reused_files)} SWF(s) from last run, \
+{len(self.patch_data)} SWF(s) left to process."
+        )
+
+    def copy_reused_outputs(self):
+        """
+        Copies reused output files from the output folder to the temp folder.
+        """
+
+        src_folder = Path(".").resolve() / "Output"
+        dst_folder = self.tmpdir / "Output"
+
+        for outputs in self.reused_files.values():
+            for output in outputs:
+                os.makedirs((dst_folder / output).parent, exist_ok=True)
+                shutil.copyfile(src_folder / output, dst_folder / output)
+
+    def save_manifest(self):
+        """
+        Writes manifest with hashes and output files of all processed
+        and reused SWFs for the next run.
+        """
+
+        files: dict[str, dict] = {}
+
+        for swf_file, patch_data in self.patch_data.items():
+            if swf_file not in self.file_hashes:
+                continue
+
+            outputs: list[str] = []
+
+            json_file = Path("Patch") / swf_file.with_suffix(".json")
+            if (self.tmpdir / "Output" / json_file).is_file():
+                outputs.append(json_file.as_posix())
+
+            for shape in patch_data.get("shapes", []):
+                outputs.append((Path("Shapes") / shape["fileName"]).as_posix())
+
+            files[swf_file.as_posix()] = {
+                "hashes": self.file_hashes[swf_file],
+                "outputs": outputs,
+            }
+
+        for swf_file, outputs in self.reused_files.items():
+            files[swf_file.as_posix()] = {
+                "hashes": self.file_hashes[swf_file],
+                "outputs": outputs,
+            }
+
+        manifest = {
+            "key": self.get_manifest_key(),
+            "files": files,
+        }
+
+        os.makedirs(MANIFEST_PATH.parent, exist_ok=True)
+        MANIFEST_PATH.write_text(json.dumps(manifest, indent=4), encoding="utf8")
+
+    def copy_files(self):
+        """
+        Copies all required files to the temp folder.
+        """
+
+        self.log.info("Copying patched files...")
+
+        for file in self.patch_data.keys():
+            src_path = self.patched_mod_path / file
+            dst_path = self.tmpdir / "Patch" / file
+
+            os.makedirs(dst_path.parent, exist_ok=True)
+            shutil.copyfile(src_path, dst_path)
+
+        self.log.info("Copying original mod files...")
+
+        missing_files = self.original_vfs.extract_files(
+            to_dir=self.tmpdir / "Original",
+            files=list(self.patch_data.keys()),
+            max_workers=BSA_DECOMPRESSION_WORKERS or None
+        )
+
+        if missing_files:
+            raise errors.SWFFileNotFoundError(f"File '{missing_files[0]}' not found in Original mod!")
+
+        self.log.info("Patched and original files ready to create patch.")
+
+    def init_ffdec(self):
+        """
+        Initializes FFDec pool if required.
+        """
+
+        with self.ffdec_lock:
+            if self.ffdec_pool is None:
+                self.ffdec_pool = ffdec.FFDecPool(
+                    self.app,
+                    FFDEC_WORKERS,
+                    self.java_launcher,
+                    self.cancel_event
+                )
+
+    def cancel(self):
+        """
+        Cancels patch creation. Queued SWFs are not processed,
+        running FFDec processes are killed and no step or
+        FFDec command starts afterwards.
+        """
+
+        self.cancel_event.set()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+        if self.ffdec_pool is not None:
+            self.ffdec_pool.cancel()
+
+    def check_cancelled(self):
+        """
+        Raises errors.CancelledError if patch creation was cancelled.
+        """
+
+        if self.cancel_event.is_set():
+            raise errors.CancelledError("Patch creation was cancelled!")
+
+    def run_concurrently(self, function: Callable[[Path], Any], swf_files: list[Path]):
+        """
+        Calls <function> for every SWF in <swf_files> in a thread pool.
+        Stops queued calls as soon as one call fails.
+
+        Parameters:
+            function: Callable, called with the relative path of a SWF
+            swf_files: list of relative SWF paths
+
+        Returns:
+            results: dict, return value of <function> per SWF
+
+        Raises:
+            errors.CancelledError: if patch creation was cancelled
+        """
+
+        results: dict[Path, Any] = {}
+
+        with ThreadPoolExecutor(
+            FFDEC_WORKERS,
+            thread_name_prefix="PatchCreator"
+        ) as executor:
+            self.executor = executor
+            futures = {
+                executor.submit(function, swf_file): swf_file
+                for swf_file in swf_files
+            }
+
+            try:
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+            except Exception:
+                executor.shutdown(cancel_futures=True)
+                # Futures that were cancelled by a cancel raise their own error
+                self.check_cancelled()
+                raise
+
+        return results
+
+    def load_cached_xml(self, swf_path: Path, cache_key: str = None):
+        """
+        Loads XML of <swf_path> from the cache if possible.
+
+        Parameters:
+            swf_path: Path, SWF file in the temp folder
+            cache_key: str, replaces the default key of the SWF's content
+
+        Returns:
+            (cache_key, found): tuple of str and bool, cache_key is None
+                if the cache is disabled
+        """
 
-    def __init__(self, app: MainApp, patched_mod_path: Path, original_mod_path: Path):
-        self.app = app
-        self.patched_mod_path = patched_mod_path
-        self.original_mod_path = original_mod_path
+        if not self.xml_cache.enabled:
+            return None, False
 
-        self.log = logging.getLogger(self.__repr__())
-        self.log.addHandler(self.app.log_str)
-        self.log.setLevel(self.app.log.level)
+        if cache_key is None:
+            cache_key = self.xml_cache.get_key(swf_path)
 
-        self.load_patch()
+        found = self.xml_cache.get(cache_key, swf_path.with_suffix(".xml"))
 
-    def __repr__(self):
-        return "PatchCreator"
+        if found:
+            self.log.debug(f"Loaded '{swf_path.with_suffix('.xml').name}' from cache.")
 
-    def load_patch(self):
-        self.patch_data = {}
+        return cache_key, found
 
-        self.log.info("Loading patched mod...")
+    def convert_swf2xml(self, folder: str, swf_file: Path, cache_key: str = None):
+        """
+        Converts <swf_file> in <folder> of the temp folder to XML
+        with the next idle FFDec process or loads it from the cache.
 
-        for swf_file in self.patched_mod_path.glob("**\\*.swf"):
-            if swf_file.name in FILE_BLACKLIST:
-                continue
-            swf_file = swf_file.relative_to(self.patched_mod_path)
-            self.patch_data[swf_file] = {}
-            self.log.debug(f"Found '{swf_file}'.")
+        Returns:
+            converted: bool, True if conversion succeeded
+        """
 
-        self.log.info(f"Loaded patched mod with {len(self.patch_data)} SWF file(s).")
+        swf_path = self.tmpdir / folder / swf_file
+        self.xml_trees.invalidate(swf_path.with_suffix(".xml"))
+        cache_key, found = self.load_cached_xml(swf_path, cache_key)
 
-    def copy_files(self):
+        if found:
+            return True
+
+        self.init_ffdec()
+        converted = self.ffdec_pool.swf2xml(swf_path, swf_path.with_suffix(".xml"))
+
+        if converted and cache_key is not None:
+            self.xml_cache.set(cache_key, swf_path.with_suffix(".xml"))
+
+        return converted
+
+    def convert_swfs2xmls(
+        self,
+        folder: str,
+        cache_keys: dict[Path, str] = None,
+        files: list[Path] = None
+    ):
         """
-        Copies all required files to the temp folder.
+        Converts all SWFs in <folder> of the temp folder to XMLs
+        with concurrent FFDec processes.
+        XMLs are loaded from the cache if possible.
+        Files that fail to convert are removed from the patch.
+
+        Parameters:
+            folder: str, "Original" or "Patch"
+            cache_keys: dict of SWF files and cache keys that replace
+                the default key of the SWF's content
+            files: list of SWF files to convert, all SWFs of the patch by default
         """
 
-        self.log.info("Copying patched files...")
+        cache_keys = dict(cache_keys or {})
+        files = list(self.patch_data.keys()) if files is None else files
+        swf_files: dict[Path, Path] = {}
 
-        for file in self.patch_data.keys():
-            src_path = self.patched_mod_path / file
-            dst_path = self.tmpdir / "Patch" / file
+        for swf_file in files:
+            swf_path = self.tmpdir / folder / swf_file
+            self.xml_trees.invalidate(swf_path.with_suffix(".xml"))
+            cache_keys[swf_file], found = self.load_cached_xml(swf_path, cache_keys.get(swf_file))
 
-            os.makedirs(dst_path.parent, exist_ok=True)
-            shutil.copyfile(src_path, dst_path)
-        
-        self.log.info("Copying original mod files...")
+            if not found:
+                swf_files[swf_path] = swf_file
 
-        for file in self.patch_data.keys():
-            src_path = self.original_mod_path / file
-            dst_path = self.tmpdir / "Original" / file
-
-            if not src_path.exists():
-                for bsa_file in self.original_mod_path.glob("*.bsa"):
-                    bsa_archive = bsa.BSAArchive.parse_file(str(bsa_file))
-                    if bsa_archive.contains_file(file):
-                        dst_path = self.tmpdir / "Original"
-                        os.makedirs(dst_path, exist_ok=True)
-                        bsa_archive.extract_file(to_dir=dst_path, file=file)
-                        self.log.debug(f"Extracted '{file}' from '{bsa_file}'.")
-                        break
-                else:
-                    raise errors.SWFFileNotFoundError(f"File '{file}' not found in Original mod!")
-            else:
-                os.makedirs(dst_path.parent, exist_ok=True)
-                shutil.copyfile(src_path, dst_path)
-        
-        self.log.info("Patched and original files ready to create patch.")
+        if self.xml_cache.enabled:
+            self.log.info(
+                f"Loaded {len(files) - len(swf_files)} XML(s) from cache."
+            )
 
-    def convert_patched_swfs2xmls(self):
-        for swf_file in self.patch_data.keys():
-            self.log.info(f"Converting patched '{swf_file}'...")
+        if not swf_files:
+            return
 
-            patched_swf = self.tmpdir / "Patch" / swf_file
+        self.init_ffdec()
 
-            # Initialize ffdec interface if required
-            if self.ffdec_interface is None:
-                self.ffdec_interface = ffdec.FFDec(patched_swf, self.app)
+        results = self.ffdec_pool.swf2xmls([
+            (swf_path, swf_path.with_suffix(".xml"))
+            for swf_path in swf_files.keys()
+        ])
 
-            # Convert patched file
-            self.ffdec_interface.swf_path = patched_swf
-            self.ffdec_interface.swf2xml()
+        for swf_path, converted in results.items():
+            swf_file = swf_files[swf_path]
 
-    def convert_original_swfs2xmls(self):
-        for swf_file in self.patch_data.keys():
-            self.log.info(f"Converting original '{swf_file}'...")
+            if not converted:
+                self.patch_data.pop(swf_file)
+                self.log.error(f"Skipped '{swf_file}' since it could not be converted!")
+            elif cache_keys[swf_file] is not None:
+                self.xml_cache.set(cache_keys[swf_file], swf_path.with_suffix(".xml"))
+
+        if self.xml_cache.enabled:
+            self.xml_cache.prune()
+
+    def convert_patched_swfs2xmls(self):
+        self.log.info("Converting patched SWFs...")
 
-            original_swf = self.tmpdir / "Original" / swf_file
+        self.convert_swfs2xmls("Patch")
+
+    def convert_original_swfs2xmls(self, files: list[Path] = None):
+        self.log.info("Converting original SWFs...")
+
+        # Original SWFs with replaced shapes are cached by their replacement set
+        self.convert_swfs2xmls("Original", self.replacement_keys, files)
+
+    @staticmethod
+    def is_streamed(*xml_paths: Path):
+        """
+        Checks if one of <xml_paths> is large enough to be compared by streaming.
+        """
 
-            # Initialize ffdec interface if required
-            if self.ffdec_interface is None:
-                self.ffdec_interface = ffdec.FFDec(original_swf, self.app)
+        if not STREAMING_COMPARE_SIZE:
+            return False
 
-            # Convert original file
-            self.ffdec_interface.swf_path = original_swf
-            self.ffdec_interface.swf2xml()
+        return any(
+            xml_path.stat().st_size > STREAMING_COMPARE_SIZE * 1024 * 1024
+            for xml_path in xml_paths
+        )
 
     def compare_xmls(self):
         """
@@ -143,14 +1156,36 @@ class PatchCreator:
         """
 
         for swf_file in self.patch_data.keys():
-            xml_file = swf_file.with_suffix(".xml")
-            self.log.info(f"Processing '{xml_file}'...")
+            self.compare_xml(swf_file)
+
+    def compare_xml(self, swf_file: Path):
+        """
+        Compares XML files of <swf_file> and stores differences in self.patch_data.
+        """
+
+        xml_file = swf_file.with_suffix(".xml")
+        self.log.info(f"Processing '{xml_file}'...")
+
+        original_xml_path = self.tmpdir / "Original" / xml_file
+        patched_xml_path = self.tmpdir / "Patch" / xml_file
+
+        patch_data = None
 
-            original_xml_path = self.tmpdir / "Original" / xml_file
-            patched_xml_path = self.tmpdir / "Patch" / xml_file
+        if self.is_streamed(original_xml_path, patched_xml_path):
+            self.log.debug(f"Comparing '{xml_file}' by streaming...")
 
-            original_xml = ET.parse(str(original_xml_path)).getroot()
-            patched_xml = ET.parse(str(patched_xml_path)).getroot()
+            comparison = StreamingComparison(original_xml_path, patched_xml_path)
+            try:
+                patch_data = comparison.compare()
+            except errors.UnsupportedXMLError as ex:
+                self.log.warning(
+                    f"Failed to compare '{xml_file}' by streaming: {ex} Comparing it in memory..."
+                )
+
+        if patch_data is None:
+            # Removed from the cache since split_frames modifies them
+            original_xml = self.xml_trees.pop(original_xml_path).getroot()
+            patched_xml = self.xml_trees.pop(patched_xml_path).getroot()
 
             # Prepare xmls
             original_xml = self.split_frames(original_xml)
@@ -158,31 +1193,44 @@ class PatchCreator:
 
             patch_data = self.compare_elements(original_xml, patched_xml, ".", "swf")
 
-            if patch_data:
-                self.patch_data[swf_file]["swf"] = patch_data
-            else:
-                self.log.info("Detected no differences in file.")
+        if patch_data:
+            self.patch_data[swf_file]["swf"] = patch_data
+        else:
+            self.log.info(f"Detected no differences in '{xml_file}'.")
 
     @staticmethod
     def compare_elements(
         original_root: ET.Element,
         patched_element: ET.Element,
         cur_xpath: str,
-        root: str
+        root: str,
+        index: ElementIndex = None
     ):
         result = {}
 
+        if index is None:
+            index = ElementIndex(original_root, patched_element, root)
+
         if (patched_element.get("type", "item") not in TYPE_BLACKLIST
             and patched_element.tag not in TAG_BLACKLIST):
             if patched_element.tag != root:
+                parent_xpath = cur_xpath
                 cur_xpath += "/" + patched_element.tag
 
                 # Find original element
                 # because element order can differ
+                filters: list[tuple[str, str]] = []
                 for key, value in patched_element.items():
                     if key in FILTER_WHITELIST:
                         cur_xpath += f"[@{key}='{value}']"
-            original_element = original_root.find(cur_xpath)
+                        filters.append((key, value))
+
+                index.add_path(cur_xpath, parent_xpath, patched_element.tag, filters)
+            original_element = index.find(cur_xpath)
+
+            # Skip identical subtree
+            if original_element is not None and index.is_unchanged(patched_element, original_element):
+                return {}
 
             # If element is found, compare attributes
             if original_element is not None:
@@ -208,12 +1256,13 @@ class PatchCreator:
                 result = new_attrib
 
         # Compare child elements
-        for patched_child in patched_element.findall("./"):
+        for patched_child in patched_element:
             child_result = PatchCreator.compare_elements(
                 original_root,
                 patched_child,
                 cur_xpath,
-                root
+                root,
+                index
             )
             tag = patched_child.tag
 
@@ -250,109 +1299,479 @@ class PatchCreator:
         """
 
         self.log.info("Exporting patched shapes...")
+
+        # Every SWF writes only its own patch data
+        # and exports to its own folder
+        self.run_concurrently(self.extract_file_shapes, list(self.patch_data.keys()))
+
+    def get_shape_folder(self, swf_file: Path):
+        """
+        Returns name of the folder in the shapes folder for shapes of <swf_file>.
+        That is the name of <swf_file> without suffix or its path
+        if another SWF of the patch has the same name.
+        """
+
+        swf_files = list(self.patch_data.keys()) + list(self.reused_files.keys())
+        stem = swf_file.stem.lower()
+
+        if sum(file.stem.lower() == stem for file in swf_files) > 1:
+            return swf_file.with_suffix("").as_posix()
+
+        return swf_file.stem
+
+    def extract_file_shapes(self, swf_file: Path):
+        """
+        Extracts different shapes of <swf_file> to shapes folder.
+        """
+
         shapes_folder = self.tmpdir / "Output" / "Shapes"
+        patch_data = self.patch_data[swf_file]
+        patched_swf_path = self.tmpdir / "Patch" / swf_file
 
-        for swf_file, patch_data in self.patch_data.items():
-            xml_file = swf_file.with_suffix(".xml")
+        different_shapes, added_shapes, removed_shapes = self.get_file_shape_changes(swf_file)
 
-            original_xml_path = self.tmpdir / "Original" / xml_file
-            patched_xml_path = self.tmpdir / "Patch" / xml_file
-            patched_swf_path = self.tmpdir / "Patch" / swf_file
+        if added_shapes:
+            self.log.warning(
+                f"Ignored shape(s) {', '.join(added_shapes)} of '{swf_file}' \
+since they do not exist in the original SWF!"
+            )
+        if removed_shapes:
+            self.log.warning(
+                f"Ignored shape(s) {', '.join(removed_shapes)} of '{swf_file}' \
+since they were removed from the patched SWF!"
+            )
 
-            original_xml = ET.parse(str(original_xml_path))
-            patched_xml = ET.parse(str(patched_xml_path))
+        if different_shapes:
+            self.log.info(f"Processing '{swf_file}'...")
+            patch_data["shapes"] = []
+            outpath = shapes_folder / self.get_shape_folder(swf_file)
+            os.makedirs(outpath, exist_ok=True)
 
-            different_shapes = self.get_different_shapes(original_xml, patched_xml)
+            # Exported to a separate folder first, so that only
+            # files of this export are added to the patch data
+            staging_folder = self.tmpdir / "Staging"
+            os.makedirs(staging_folder, exist_ok=True)
+            export_path = Path(tmp.mkdtemp(dir=staging_folder))
 
-            if different_shapes:
-                self.log.info(f"Processing '{swf_file}'...")
-                patch_data["shapes"] = []
-                outpath = shapes_folder / swf_file.stem
-                os.makedirs(outpath, exist_ok=True)
+            try:
+                self.init_ffdec()
+                with self.ffdec_pool.get_interface() as ffdec_interface:
+                    ffdec_interface.swf_path = patched_swf_path
+                    ffdec_interface.export_shapes(different_shapes, export_path, EXPORT_FORMAT)
 
-                self.ffdec_interface.swf_path = patched_swf_path
-                self.ffdec_interface.export_shapes(different_shapes, outpath, EXPORT_FORMAT)
+                for exported_shape in sorted(export_path.glob("./*")):
+                    shape = outpath / exported_shape.name
+                    os.replace(exported_shape, shape)
 
-                for shape in outpath.glob("./*"):
-                    shape_id = shape.stem
                     patch_data["shapes"].append({
-                        "id": shape_id,
+                        "id": shape.stem,
                         "fileName": str(shape.relative_to(shapes_folder))
                     })
-                patch_data["shapes"].sort(
-                    key=lambda shape: int(shape["id"])
+            finally:
+                shutil.rmtree(export_path, ignore_errors=True)
+
+            patch_data["shapes"].sort(
+                key=lambda shape: (int(shape["id"]), shape["fileName"])
+            )
+
+    def get_file_shape_changes(self, swf_file: Path):
+        """
+        Compares shapes of <swf_file> in the SWFs if NATIVE_SHAPE_DIFF is enabled
+        or else in the XMLs.
+
+        Returns:
+            (different_shapes, added_shapes, removed_shapes): tuple of lists with shape ids
+        """
+
+        xml_file = swf_file.with_suffix(".xml")
+        original_xml_path = self.tmpdir / "Original" / xml_file
+        patched_xml_path = self.tmpdir / "Patch" / xml_file
+
+        if NATIVE_SHAPE_DIFF:
+            try:
+                return self.get_native_shape_changes(
+                    self.tmpdir / "Original" / swf_file,
+                    self.tmpdir / "Patch" / swf_file
                 )
+            except errors.InvalidSWFFileError as ex:
+                self.log.warning(f"Failed to read shapes of '{swf_file}': {ex} Comparing XMLs instead...")
+
+            # Original XML is only converted after shapes are replaced
+            if not (original_xml_path.is_file() or self.convert_swf2xml("Original", swf_file)):
+                return [], [], []
+
+        with self.compare_semaphore:
+            if self.is_streamed(original_xml_path, patched_xml_path):
+                return StreamingComparison.get_shape_changes(original_xml_path, patched_xml_path)
+
+            original_xml = self.xml_trees.get(original_xml_path)
+            patched_xml = self.xml_trees.get(patched_xml_path)
+
+            return self.get_shape_changes(original_xml, patched_xml)
 
     def patch_shapes(self):
         """
         Replaces shapes in original files to
         exclude shape-related differences when creating
         the actual patch.
+
+        Returns:
+            patched_files: list of SWF files that have to be converted again
         """
 
         self.log.info("Replacing shapes in original files...")
 
-        for swf_file, patch_data in self.patch_data.items():
-            shapes: dict[Path, list[int]] = {}
+        return [
+            swf_file
+            for swf_file in list(self.patch_data.keys())
+            if self.patch_file_shapes(swf_file)
+        ]
+
+    def patch_file_shapes(self, swf_file: Path):
+        """
+        Replaces shapes in original <swf_file>.
+
+        If the XML of the original SWF with the same replaced shapes
+        is cached, it is loaded instead of replacing the shapes.
+
+        Returns:
+            patched: bool, True if shapes were replaced in the original SWF
+                and it has to be converted again
+        """
+
+        patch_data = self.patch_data[swf_file]
+        shapes: dict[Path, list[int]] = {}
 
-            for shape_data in patch_data.get("shapes", []):
-                shape_path: Path = (self.tmpdir / "Output" / "Shapes" / shape_data["fileName"]).resolve()
+        for shape_data in patch_data.get("shapes", []):
+            shape_path: Path = (self.tmpdir / "Output" / "Shapes" / shape_data["fileName"]).resolve()
 
-                if not shape_path.is_file():
-                    self.log.error(
-                        f"Failed to patch shape with id '{shape_data['id']}': \
+            if not shape_path.is_file():
+                self.log.error(
+                    f"Failed to patch shape with id '{shape_data['id']}': \
 File '{shape_path}' does not exist!"
-                    )
-                    continue
+                )
+                continue
 
-                shape_ids: list[int] = [
-                    int(shape_id)
-                    for shape_id in shape_data["id"].split(",")
-                ]
+            shape_ids: list[int] = [
+                int(shape_id)
+                for shape_id in shape_data["id"].split(",")
+            ]
 
-                if shape_path in shapes:
-                    shapes[shape_path] += shape_ids
-                else:
-                    shapes[shape_path] = shape_ids
+            if shape_path in shapes:
+                shapes[shape_path] += shape_ids
+            else:
+                shapes[shape_path] = shape_ids
+
+        if not shapes:
+            return False
+
+        self.log.info(f"Processing '{swf_file}'...")
+        original_swf = self.tmpdir / "Original" / swf_file
 
-            if shapes:
-                self.log.info(f"Processing '{swf_file}'...")
-                original_swf = self.tmpdir / "Original" / swf_file
-                self.ffdec_interface.swf_path = original_swf
-                self.ffdec_interface.replace_shapes(shapes)
+        if self.xml_cache.enabled:
+            replacement_key = self.xml_cache.get_key(
+                original_swf,
+                "replace_shapes",
+                *sorted(
+                    f"{self.xml_cache.hash_file(shape_path)}:{sorted(shape_ids)}"
+                    for shape_path, shape_ids in shapes.items()
+                )
+            )
+
+            # XML of the original with replaced shapes is already cached.
+            # It is loaded right away since a later cache miss would
+            # convert the original SWF without replaced shapes.
+            original_xml_path = original_swf.with_suffix(".xml")
+            self.xml_trees.invalidate(original_xml_path)
+            _, found = self.load_cached_xml(original_swf, replacement_key)
+
+            if found:
+                return False
+
+            self.replacement_keys[swf_file] = replacement_key
+
+        self.init_ffdec()
+        with self.ffdec_pool.get_interface() as ffdec_interface:
+            ffdec_interface.swf_path = original_swf
+            ffdec_interface.replace_shapes(shapes)
+
+        return True
 
     @staticmethod
-    def get_different_shapes(original_xml: ET.ElementTree, patched_xml: ET.ElementTree):
+    def get_shapes(xml: ET.ElementTree):
+        """
+        Returns shape items of <xml> with a type in SHAPE_TYPES,
+        ordered by type like in SHAPE_TYPES and then by document order.
+        """
+
+        shapes: dict[str, list[ET.Element]] = {shape_type: [] for shape_type in SHAPE_TYPES}
+
+        for parent in xml.getroot():
+            for item in parent:
+                if item.tag != "item" or "shapeId" not in item.attrib:
+                    continue
+
+                if (shape_type := item.get("type")) in shapes:
+                    shapes[shape_type].append(item)
+
+        return [shape for shape_type in SHAPE_TYPES for shape in shapes[shape_type]]
+
+    @staticmethod
+    def get_shape_changes(original_xml: ET.ElementTree, patched_xml: ET.ElementTree):
+        """
+        Compares shapes of <original_xml> and <patched_xml> by type and shape id.
+
+        Returns:
+            (different_shapes, added_shapes, removed_shapes): tuple of lists with shape ids
+        """
+
         different_shapes: list[str] = []
+        removed_shapes: list[str] = []
+        hashes: dict[ET.Element, int] = {}
 
-        original_shapes: list[ET.Element] = []
-        for shape_type in SHAPE_TYPES:
-            original_shapes += original_xml.findall(f"*/item[@type='{shape_type}'][@shapeId]")
+        # First shape of every type and id like ElementTree's find
+        patched_shapes: dict[tuple[str, str], ET.Element] = {}
+        for patched_shape in PatchCreator.get_shapes(patched_xml):
+            key = (patched_shape.attrib["type"], patched_shape.attrib["shapeId"])
+            patched_shapes.setdefault(key, patched_shape)
 
-        for original_shape in original_shapes:
+        original_keys: set[tuple[str, str]] = set()
+        for original_shape in PatchCreator.get_shapes(original_xml):
             shape_id = original_shape.attrib["shapeId"]
             shape_type = original_shape.attrib["type"]
+            original_keys.add((shape_type, shape_id))
+
+            patched_shape = patched_shapes.get((shape_type, shape_id))
+            if patched_shape is None:
+                removed_shapes.append(shape_id)
+                continue
 
-            patched_xpath = f"*/item[@type='{shape_type}'][@shapeId='{shape_id}']"
-            patched_shape = patched_xml.find(patched_xpath)
-            if PatchCreator.check_if_different(original_shape, patched_shape):
+            PatchCreator.get_subtree_hashes(original_shape, hashes)
+            if patched_shape not in hashes:
+                PatchCreator.get_subtree_hashes(patched_shape, hashes)
+
+            if PatchCreator.check_if_different(original_shape, patched_shape, hashes):
                 different_shapes.append(shape_id)
 
+        added_shapes: list[str] = [
+            shape_id
+            for shape_type, shape_id in patched_shapes.keys()
+            if (shape_type, shape_id) not in original_keys
+        ]
+
+        return different_shapes, added_shapes, removed_shapes
+
+    @staticmethod
+    def get_native_shape_changes(original_swf_path: Path, patched_swf_path: Path):
+        """
+        Compares DefineShape tags of <original_swf_path> and <patched_swf_path>
+        like get_shape_changes, without converting the SWFs to XMLs.
+        Shapes are different if their tags are not byte-identical.
+
+        Returns:
+            (different_shapes, added_shapes, removed_shapes): tuple of lists with shape ids
+        """
+
+        with original_swf_path.open("rb") as file:
+            original_shapes = swf.SWFMovie.read(file).get_shapes()
+        with patched_swf_path.open("rb") as file:
+            patched_shapes = swf.SWFMovie.read(file).get_shapes()
+
+        different_shapes: list[str] = []
+        removed_shapes: list[str] = []
+
+        # First shape of every type and id like ElementTree's find
+        patched_data: dict[tuple[str, str], bytes] = {}
+        for shape_type in SHAPE_TYPES:
+            for patched_shape in patched_shapes:
+                if patched_shape.name == shape_type:
+                    key = (shape_type, str(patched_shape.shape_id))
+                    patched_data.setdefault(key, patched_shape.data)
+
+        original_keys: set[tuple[str, str]] = set()
+        for shape_type in SHAPE_TYPES:
+            for original_shape in original_shapes:
+                if original_shape.name != shape_type:
+                    continue
+
+                shape_id = str(original_shape.shape_id)
+                original_keys.add((shape_type, shape_id))
+
+                data = patched_data.get((shape_type, shape_id))
+                if data is None:
+                    removed_shapes.append(shape_id)
+                elif data != original_shape.data:
+                    different_shapes.append(shape_id)
+
+        added_shapes: list[str] = [
+            shape_id
+            for shape_type, shape_id in patched_data.keys()
+            if (shape_type, shape_id) not in original_keys
+        ]
+
+        return different_shapes, added_shapes, removed_shapes
+
+    @staticmethod
+    def get_different_shapes(original_xml: ET.ElementTree, patched_xml: ET.ElementTree):
+        different_shapes, _, _ = PatchCreator.get_shape_changes(original_xml, patched_xml)
+
         return different_shapes
 
     @staticmethod
-    def check_if_different(elem1: ET.Element, elem2: ET.Element):
+    def get_subtree_hashes(element: ET.Element, hashes: dict[ET.Element, int] = None):
+        """
+        Hashes tag, attributes and child hashes of every element
+        in <element>'s subtree bottom-up.
+        Elements with identical subtrees have identical hashes.
+        Hashes are only comparable within the same process.
+
+        Leaves below <element> are left out to save memory,
+        use get_hash to get the hash of any element.
+
+        Parameters:
+            element: ET.Element, root of subtree
+            hashes: dict, hashes are added to it if specified
+
+        Returns:
+            hashes: dict of elements and their hashes
+        """
+
+        if hashes is None:
+            hashes = {}
+
+        hashes[element] = PatchCreator._hash_subtree(element, hashes)
+
+        return hashes
+
+    @staticmethod
+    def _hash_subtree(element: ET.Element, hashes: dict[ET.Element, int]):
+        attributes = tuple(sorted(element.items()))
+
+        if not len(element):
+            return hash((element.tag, attributes, ()))
+
+        element_hash = hash((
+            element.tag,
+            attributes,
+            tuple(PatchCreator._hash_subtree(child, hashes) for child in element)
+        ))
+        hashes[element] = element_hash
+
+        return element_hash
+
+    @staticmethod
+    def get_hash(element: ET.Element, hashes: dict[ET.Element, int]):
+        """
+        Returns hash of <element> from <hashes>
+        or None if its subtree has not been hashed.
+        """
+
+        element_hash = hashes.get(element)
+
+        if element_hash is None and not len(element):
+            element_hash = hash((element.tag, tuple(sorted(element.items())), ()))
+
+        return element_hash
+
+    @staticmethod
+    def is_skippable(
+        patched_element: ET.Element,
+        hashes: dict[ET.Element, int],
+        root: str,
+        skippable: dict[ET.Element, bool]
+    ):
+        """
+        Checks if compare_elements gives no result for <patched_element>
+        if its original element has the same hash.
+
+        This is not the case for subtrees that contain
+        - blacklisted elements, since their children are searched at their parent's XPath,
+        - elements of LIST_TAGS with filter attributes, since their results become lists,
+        - elements with the root tag or filter values that break XPaths,
+        - children whose XPath first matches a different sibling.
+
+        Parameters:
+            patched_element: ET.Element, root of subtree
+            hashes: dict, subtree hashes of patched elements
+            root: str, root tag like in compare_elements
+            skippable: dict, results of already checked elements
+        """
+
+        if patched_element in skippable:
+            return skippable[patched_element]
+
+        filters = [
+            (key, value)
+            for key, value in patched_element.items()
+            if key in FILTER_WHITELIST
+        ]
+
+        skip = not (
+            patched_element.get("type", "item") in TYPE_BLACKLIST
+            or patched_element.tag in TAG_BLACKLIST
+            or patched_element.tag == root
+            or any(("/" in value or "[" in value or "'" in value) for _, value in filters)
+            or (patched_element.tag in LIST_TAGS and len(patched_element) and filters)
+        )
+
+        # First sibling that matches tag and filter attributes of each child
+        first_matches: dict[tuple, dict[tuple, ET.Element]] = {}
+
+        for child in patched_element:
+            if not skip:
+                break
+
+            child_filters = sorted(
+                (key, value)
+                for key, value in child.items()
+                if key in FILTER_WHITELIST
+            )
+            keys = tuple(key for key, _ in child_filters)
+            values = tuple(value for _, value in child_filters)
+
+            if (child.tag, keys) not in first_matches:
+                matches: dict[tuple, ET.Element] = {}
+                for sibling in patched_element:
+                    if sibling.tag == child.tag:
+                        sibling_values = tuple(sibling.get(key) for key in keys)
+                        if None not in sibling_values:
+                            matches.setdefault(sibling_values, sibling)
+                first_matches[(child.tag, keys)] = matches
+
+            skip = (
+                PatchCreator.get_hash(first_matches[(child.tag, keys)][values], hashes)
+                == PatchCreator.get_hash(child, hashes)
+                and PatchCreator.is_skippable(child, hashes, root, skippable)
+            )
+
+        skippable[patched_element] = skip
+
+        return skip
+
+    @staticmethod
+    def check_if_different(
+        elem1: ET.Element,
+        elem2: ET.Element,
+        hashes: dict[ET.Element, int] = None
+    ):
         # Check if one of the elements is None
         if elem1 is None and elem2 is not None or (elem1 is not None and elem2 is None):
             return True
 
+        # Identical subtrees are not different
+        if hashes is not None:
+            elem1_hash = PatchCreator.get_hash(elem1, hashes)
+
+            if elem1_hash is not None and elem1_hash == PatchCreator.get_hash(elem2, hashes):
+                return False
+
         # Check if element attributes are different
         if elem1.attrib != elem2.attrib:
             return True
 
         # Compare children recursively
         for child1, child2 in zip(elem1, elem2):
-            if PatchCreator.check_if_different(child1, child2):
+            if PatchCreator.check_if_different(child1, child2, hashes):
                 return True
 
         return False
@@ -362,40 +1781,45 @@ File '{shape_path}' does not exist!"
         """
         Split frames in xml_element recursively
         and return xml_element with frames.
+
+        Elements with more than one ShowFrameTag get their children
+        grouped into frame elements, elements after the last
+        ShowFrameTag are dropped.
         """
 
-        new_frame = ET.Element("frame")
-        current_frame = 1
-        new_frame.set("frameId", str(current_frame))
-        new_frame_subtags = ET.Element("subTags")
-        new_frame.append(new_frame_subtags)
+        children = list(xml_element)
 
-        frame_delimiters = xml_element.findall("./item[@type='ShowFrameTag']")
+        # Split children recursively
+        for child in children:
+            PatchCreator.split_frames(child)
 
-        # Iterate over all child elements
-        for child in xml_element.findall("./"):
-            # Split child recursively
-            child = PatchCreator.split_frames(child)
+        frame_count = sum(
+            child.tag == "item" and child.get("type") == "ShowFrameTag"
+            for child in children
+        )
 
+        if frame_count <= 1:
+            return xml_element
+
+        frames: list[ET.Element] = []
+        frame_children: list[ET.Element] = []
+
+        for child in children:
             # If child is not a frame delimiter
-            if len(frame_delimiters) > 1:
-                # Remove child from xml_element
-                xml_element.remove(child)
-
-                # If child is not a frame delimiter
-                if child.get("type") != "ShowFrameTag":
-                    # Append child to current frame
-                    new_frame_subtags.append(child)
-
-                # If child is a frame delimiter
-                elif child in frame_delimiters:
-                    xml_element.append(new_frame)
-                    # Create new frame
-                    new_frame = ET.Element("frame")
-                    current_frame += 1
-                    new_frame.set("frameId", str(current_frame))
-                    new_frame_subtags = ET.Element("subTags")
-                    new_frame.append(new_frame_subtags)
+            if child.get("type") != "ShowFrameTag":
+                frame_children.append(child)
+
+            # If child is a frame delimiter
+            elif child.tag == "item":
+                frame = xml_element.makeelement("frame", {"frameId": str(len(frames) + 1)})
+                frame_subtags = frame.makeelement("subTags", {})
+                frame_subtags.extend(frame_children)
+                frame.append(frame_subtags)
+                frames.append(frame)
+                frame_children = []
+
+        # Replace all children at once
+        xml_element[:] = frames
 
         return xml_element
 
@@ -405,18 +1829,26 @@ File '{shape_path}' does not exist!"
         This functions is a reverse of split_frames.
         """
 
-        for child in xml_element.findall("./"):
-            frames = child.findall("./frame")
+        for child in list(xml_element):
+            frames = [frame for frame in child if frame.tag == "frame"]
 
-            for frame in frames:
-                child.remove(frame)
+            if frames:
+                # Frame contents are moved behind the other children
+                new_children = [
+                    grandchild
+                    for grandchild in child
+                    if grandchild.tag != "frame"
+                ]
 
-                for frame_child in frame.findall("./subTags/"):
-                    child.append(frame_child)
-                
-                frame_tag = ET.Element("item")
-                frame_tag.set("type", "ShowFrameTag")
-                child.append(frame_tag)
+                for frame in frames:
+                    for frame_subtags in frame:
+                        if frame_subtags.tag == "subTags":
+                            new_children.extend(frame_subtags)
+
+                    new_children.append(child.makeelement("item", {"type": "ShowFrameTag"}))
+
+                # Replace all children at once
+                child[:] = new_children
 
             PatchCreator.unsplit_frames(child)
 
@@ -427,34 +1859,44 @@ File '{shape_path}' does not exist!"
         Creates output folder with JSON files from self.patch_data.
         """
 
+        print(self.patch_data)
+        for swf_file in self.patch_data.keys():
+            self.write_output(swf_file)
+
+        self.check_output()
+
+    def write_output(self, swf_file: Path):
+        """
+        Writes JSON file with patch data of <swf_file> to output folder.
+        """
+
         output_folder = self.tmpdir / "Output" / "Patch"
 
-        print(self.patch_data)
-        for swf_file, patch_data in self.patch_data.items():
-            shapes_patch = patch_data.get("shapes")
-            swf_patch = patch_data.get("swf")
+        shapes_patch = self.patch_data[swf_file].get("shapes")
+        swf_patch = self.patch_data[swf_file].get("swf")
 
-            if (not shapes_patch) and (not swf_patch):
-                continue
+        if (not shapes_patch) and (not swf_patch):
+            return
 
-            # Reverse order
-            patch_data = {}
-            if shapes_patch:
-                patch_data["shapes"] = shapes_patch
-            if swf_patch:
-                patch_data["swf"] = swf_patch
+        # Reverse order
+        patch_data = {}
+        if shapes_patch:
+            patch_data["shapes"] = shapes_patch
+        if swf_patch:
+            patch_data["swf"] = swf_patch
 
-            json_file = swf_file.with_suffix(".json")
+        json_file = swf_file.with_suffix(".json")
 
-            self.log.info(f"Writing '{json_file}'...")
+        self.log.info(f"Writing '{json_file}'...")
 
-            json_file = output_folder / json_file
-            os.makedirs(json_file.parent, exist_ok=True)
+        json_file = output_folder / json_file
+        os.makedirs(json_file.parent, exist_ok=True)
 
-            with open(json_file, "w") as file:
-                file.write(json.dumps(patch_data, indent=4))
-        
-        if not output_folder.is_dir():
+        with open(json_file, "w") as file:
+            file.write(json.dumps(patch_data, indent=4))
+
+    def check_output(self):
+        if not (self.tmpdir / "Output" / "Patch").is_dir():
             self.log.info("Detected no differences in files.")
 
     def finish_patch(self):
@@ -470,13 +1912,119 @@ File '{shape_path}' does not exist!"
         if dst_folder.is_dir():
             shutil.rmtree(dst_folder)
             self.log.info("Deleted existing output folder.")
-        elif src_folder.is_dir():
+
+        if src_folder.is_dir():
             shutil.copytree(src_folder, dst_folder)
 
+    def process_file(self, swf_file: Path):
+        """
+        Runs all steps of the patch creation for <swf_file>.
+
+        Returns:
+            processed: bool, False if <swf_file> could not be converted
+
+        Raises:
+            errors.CancelledError: if patch creation was cancelled
+        """
+
+        # Every step checks for a cancel first since steps
+        # of a cancelled patch would write into a deleted temp folder
+        self.check_cancelled()
+        if not self.convert_swf2xml("Patch", swf_file):
+            return False
+
+        # The native shape diff reads the original SWF,
+        # so its XML is only needed once shapes are replaced
+        self.check_cancelled()
+        if not (NATIVE_SHAPE_DIFF or self.convert_swf2xml("Original", swf_file)):
+            return False
+
+        self.check_cancelled()
+        self.extract_file_shapes(swf_file)
+
+        # Original XML only changes if shapes were replaced,
+        # the native shape diff may not have converted it yet
+        self.check_cancelled()
+        original_xml_path = self.tmpdir / "Original" / swf_file.with_suffix(".xml")
+        if self.patch_file_shapes(swf_file) or not original_xml_path.is_file():
+            cache_key = self.replacement_keys.get(swf_file)
+
+            self.check_cancelled()
+            if not self.convert_swf2xml("Original", swf_file, cache_key):
+                return False
+
+        self.check_cancelled()
+        with self.compare_semaphore:
+            self.compare_xml(swf_file)
+
+        self.check_cancelled()
+        self.write_output(swf_file)
+
+        return True
+
+    def run_pipeline(self):
+        """
+        Processes every SWF as an independent task, so that one SWF can be
+        compared while FFDec is still converting another one.
+        """
+
+        # Original files are extracted in a single pass since
+        # BSAs are read sorted by offset and decompressed in parallel
+        self.copy_files()
+        self.original_vfs.close()
+
+        swf_files = list(self.patch_data.keys())
+
+        self.log.info(f"Processing {len(swf_files)} SWF(s)...")
+
+        results = self.run_concurrently(self.process_file, swf_files)
+
+        for swf_file in swf_files:
+            if not results[swf_file]:
+                self.patch_data.pop(swf_file)
+                self.log.error(f"Skipped '{swf_file}' since it could not be converted!")
+
+        if self.xml_cache.enabled:
+            self.xml_cache.prune()
+
+        self.check_output()
+
+    def run_stages(self):
+        """
+        Runs every step for all SWFs before starting the next step.
+        Slower than run_pipeline but easier to debug.
+        """
+
+        # 1. Copy patched mod and original mod files
+        # 2 and extract BSAs if possible and necessary
+        self.copy_files()
+        self.original_vfs.close()
+
+        # 3. Convert patched and original SWFs to XMLs.
+        self.convert_original_swfs2xmls()
+        self.convert_patched_swfs2xmls()
+
+        # 5. Export different shapes via ffdec commandline
+        self.extract_shapes()
+
+        # 6. Replace shapes in original files.
+        patched_files = self.patch_shapes()
+
+        # 7. Convert original SWFs with replaced shapes to XMLs again.
+        self.convert_original_swfs2xmls(patched_files)
+
+        # 4. Compare patched and original XMLs.
+        self.compare_xmls()
+
+        # 9. Create output folder with JSON files for each modified SWF.
+        self.create_output()
+
     def create_patch(self):
         """
         Creates patch data by comparing patched mod with original mod:
 
+        0. Index original mod and skip SWFs that are identical to
+           the original SWFs or that did not change since the last run.
         1. Copy patched mod and original mod to a temp folder.
         2. Extract original mod files from BSAs if required and possible.
         3. Convert patched and original SWFs to XMLs.
@@ -495,42 +2043,50 @@ File '{shape_path}' does not exist!"
 
         9. Create output folder with JSON files for each modified SWF.
         10. Copy finished patch data to `<current directory>/Output`.
+
+        Steps 1 and 2 run once for all SWFs, steps 3 to 9 run per SWF and
+        concurrently for different SWFs unless "debug_stage_at_a_time" is enabled
+        in the config.
         """
 
         self.log.info("Creating patch data...")
 
-        # 0. Create temp folder
-        with tmp.TemporaryDirectory(prefix="DICK_") as tmpdir:
-            self.tmpdir = Path(tmpdir).resolve()
-
-            self.log.debug(f"Created temporary folder at '{self.tmpdir}'.")
-
-            # 1. Copy patched mod and original mod files
-            # 2 and extract BSAs if possible and necessary
-            self.copy_files()
+        # 0. Index original mod, skip SWFs that are identical to
+        # the original and SWFs that did not change since the last run
+        self.load_original_mod()
 
-            # 3. Convert patched and original SWFs to XMLs.
-            self.convert_original_swfs2xmls()
-            self.convert_patched_swfs2xmls()
+        try:
+            self.skip_unchanged_files()
+            self.load_manifest()
 
-            # 5. Export different shapes via ffdec commandline
-            self.extract_shapes()
+            # Create temp folder
+            with tmp.TemporaryDirectory(prefix="DICK_") as tmpdir:
+                self.tmpdir = Path(tmpdir).resolve()
 
-            # 6. Replace shapes in original files.
-            self.patch_shapes()
+                self.log.debug(f"Created temporary folder at '{self.tmpdir}'.")
 
-            # 7. Convert original SWFs to XMLs again.
-            self.convert_original_swfs2xmls()
+                self.copy_reused_outputs()
 
-            # 4. Compare patched and original XMLs.
-            self.compare_xmls()
-
-            # 9. Create output folder with JSON files for each modified SWF.
-            self.create_output()
-
-            # 10. Copy finished output folder
-            self.finish_patch()
-
-            time.sleep(3600)
+                # 1. - 9.
+                if DEBUG_STAGE_AT_A_TIME:
+                    self.run_stages()
+                else:
+                    self.run_pipeline()
+
+                # 10. Copy finished output folder
+                self.finish_patch()
+                self.save_manifest()
+        except errors.CancelledError:
+            # Cancel already cleaned up and reset the window
+            self.log.debug("Stopped cancelled patch creation.")
+            return
+        finally:
+            # Errors are handled by the caller, but BSAs
+            # and FFDec processes must not outlive a failed run
+            self.original_vfs.close()
+            self.xml_trees.clear()
+
+            if self.ffdec_pool is not None:
+                self.ffdec_pool.close()
 
         self.app.done_signal.emit()
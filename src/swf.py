@@ -0,0 +1,577 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains functions for reading SWF files without FFDec.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+import hashlib
+import lzma
+import struct
+import zlib
+from typing import BinaryIO, Iterator, NamedTuple
+
+import errors
+
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# Uncompressed, zlib-compressed and LZMA-compressed SWFs
+SIGNATURES = (b"FWS", b"CWS", b"ZWS")
+
+
+def read_header(stream: BinaryIO):
+    """
+    Reads signature, version and uncompressed file length from <stream>.
+
+    Returns:
+        (signature, version, file_length): tuple of bytes, int and int
+    """
+
+    header = stream.read(8)
+
+    if len(header) < 8 or header[:3] not in SIGNATURES:
+        raise errors.InvalidSWFFileError("File is not a valid SWF file!")
+
+    signature = header[:3]
+    version = header[3]
+    file_length: int = struct.unpack("<I", header[4:])[0]
+
+    return signature, version, file_length
+
+
+def iter_body(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yields uncompressed body of SWF in <stream>,
+    that is everything after the 8-byte header, in chunks.
+    """
+
+    signature, _version, file_length = read_header(stream)
+
+    yield from _iter_data(stream, signature, file_length, chunk_size)
+
+
+def _iter_data(stream: BinaryIO, signature: bytes, file_length: int, chunk_size: int):
+    if signature == b"FWS":
+        while chunk := stream.read(chunk_size):
+            yield chunk
+        return
+
+    # Corrupt compressed bodies are invalid SWFs like corrupt headers
+    try:
+        if signature == b"CWS":
+            decompressor = zlib.decompressobj()
+        else:
+            # LZMA SWFs store compressed length and LZMA properties
+            # instead of the header expected by lzma's FORMAT_ALONE
+            _compressed_length = stream.read(4)
+            properties = stream.read(5)
+            decompressor = lzma.LZMADecompressor(lzma.FORMAT_ALONE)
+            decompressor.decompress(
+                properties + struct.pack("<Q", file_length - 8)
+            )
+
+        while chunk := stream.read(chunk_size):
+            yield decompressor.decompress(chunk)
+
+            if decompressor.eof:
+                break
+
+        if signature == b"CWS":
+            yield decompressor.flush()
+    except (zlib.error, lzma.LZMAError) as ex:
+        raise errors.InvalidSWFFileError(f"Failed to decompress SWF: {ex}") from ex
+
+
+def get_content_hash(stream: BinaryIO):
+    """
+    Returns SHA-256 of the version and uncompressed body of SWF in <stream>.
+    SWFs with the same content have the same hash regardless of their compression.
+    """
+
+    signature, version, file_length = read_header(stream)
+
+    content_hash = hashlib.sha256(bytes([version]))
+
+    for chunk in _iter_data(stream, signature, file_length, CHUNK_SIZE):
+        content_hash.update(chunk)
+
+    return content_hash.hexdigest()
+
+
+# Names of tags like in FFDec's XMLs
+TAG_NAMES: dict[int, str] = {
+    0: "EndTag",
+    1: "ShowFrameTag",
+    2: "DefineShapeTag",
+    4: "PlaceObjectTag",
+    5: "RemoveObjectTag",
+    9: "SetBackgroundColorTag",
+    22: "DefineShape2Tag",
+    26: "PlaceObject2Tag",
+    28: "RemoveObject2Tag",
+    32: "DefineShape3Tag",
+    37: "DefineEditTextTag",
+    39: "DefineSpriteTag",
+    43: "FrameLabelTag",
+    70: "PlaceObject3Tag",
+    83: "DefineShape4Tag",
+}
+
+DEFINE_SHAPE_CODES = (2, 22, 32, 83)
+
+
+class BitReader:
+    """
+    Reads bit fields of SWF records, most significant bit first.
+    """
+
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.offset = offset
+        self.bit_offset = 0
+
+    def __repr__(self):
+        return "BitReader"
+
+    def align(self):
+        """
+        Skips remaining bits of the current byte.
+        """
+
+        if self.bit_offset:
+            self.offset += 1
+            self.bit_offset = 0
+
+    def read_ub(self, nbits: int):
+        value = 0
+
+        for _ in range(nbits):
+            if self.offset >= len(self.data):
+                raise errors.InvalidSWFFileError("Unexpected end of SWF record!")
+
+            bit = (self.data[self.offset] >> (7 - self.bit_offset)) & 1
+            value = (value << 1) | bit
+
+            self.bit_offset += 1
+            if self.bit_offset == 8:
+                self.offset += 1
+                self.bit_offset = 0
+
+        return value
+
+    def read_sb(self, nbits: int):
+        value = self.read_ub(nbits)
+
+        if nbits and value & (1 << (nbits - 1)):
+            value -= 1 << nbits
+
+        return value
+
+    def read_bool(self):
+        return bool(self.read_ub(1))
+
+    def read(self, fmt: str):
+        """
+        Reads byte-aligned values with struct format <fmt>.
+        """
+
+        self.align()
+
+        size = struct.calcsize(fmt)
+        if self.offset + size > len(self.data):
+            raise errors.InvalidSWFFileError("Unexpected end of SWF record!")
+
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += size
+
+        return values[0] if len(values) == 1 else values
+
+    def read_string(self):
+        """
+        Reads null-terminated UTF-8 string.
+        """
+
+        self.align()
+
+        rest = bytes(self.data[self.offset:])
+        length = rest.find(b"\0")
+        if length == -1:
+            raise errors.InvalidSWFFileError("Unterminated string in SWF record!")
+
+        value = rest[:length].decode("utf8", errors="replace")
+        self.offset += length + 1
+
+        return value
+
+    def read_rest(self):
+        """
+        Returns all remaining bytes.
+        """
+
+        self.align()
+
+        value = bytes(self.data[self.offset:])
+        self.offset = len(self.data)
+
+        return value
+
+    def read_rect(self):
+        self.align()
+
+        nbits = self.read_ub(5)
+        rect = Rect(*(self.read_sb(nbits) for _ in range(4)))
+        self.align()
+
+        return rect
+
+    def read_matrix(self):
+        self.align()
+
+        scale_x = scale_y = 1 << 16
+        rotate_skew0 = rotate_skew1 = 0
+
+        if self.read_bool():
+            nbits = self.read_ub(5)
+            scale_x = self.read_sb(nbits)
+            scale_y = self.read_sb(nbits)
+
+        if self.read_bool():
+            nbits = self.read_ub(5)
+            rotate_skew0 = self.read_sb(nbits)
+            rotate_skew1 = self.read_sb(nbits)
+
+        nbits = self.read_ub(5)
+        translate_x = self.read_sb(nbits)
+        translate_y = self.read_sb(nbits)
+        self.align()
+
+        return Matrix(scale_x, scale_y, rotate_skew0, rotate_skew1, translate_x, translate_y)
+
+    def read_color_transform(self, with_alpha: bool):
+        self.align()
+
+        has_add_terms = self.read_bool()
+        has_mult_terms = self.read_bool()
+        nbits = self.read_ub(4)
+        channels = 4 if with_alpha else 3
+
+        mult_terms = (256,) * channels
+        add_terms = (0,) * channels
+
+        if has_mult_terms:
+            mult_terms = tuple(self.read_sb(nbits) for _ in range(channels))
+        if has_add_terms:
+            add_terms = tuple(self.read_sb(nbits) for _ in range(channels))
+        self.align()
+
+        return ColorTransform(mult_terms, add_terms)
+
+
+class Rect(NamedTuple):
+    """
+    Rectangle in twips.
+    """
+
+    x_min: int
+    x_max: int
+    y_min: int
+    y_max: int
+
+
+class Matrix(NamedTuple):
+    """
+    Transformation matrix, scale and rotation are 16.16 fixed-point values.
+    """
+
+    scale_x: int
+    scale_y: int
+    rotate_skew0: int
+    rotate_skew1: int
+    translate_x: int
+    translate_y: int
+
+
+class ColorTransform(NamedTuple):
+    """
+    Multiplication and addition terms of red, green, blue and optionally alpha.
+    """
+
+    mult_terms: tuple[int, ...]
+    add_terms: tuple[int, ...]
+
+
+class Tag(NamedTuple):
+    """
+    Undecoded tag of a tag stream.
+    """
+
+    code: int
+    """Tag type."""
+
+    offset: int
+    """Offset of the tag's header in the uncompressed SWF."""
+
+    data: memoryview
+    """Tag body without header."""
+
+    @property
+    def name(self):
+        return TAG_NAMES.get(self.code, f"UnknownTag{self.code}")
+
+
+class DefineShape(NamedTuple):
+    """
+    DefineShape, DefineShape2, DefineShape3 or DefineShape4 tag.
+    Shape styles and records are not decoded.
+    """
+
+    name: str
+    shape_id: int
+    shape_bounds: Rect
+    edge_bounds: Rect | None
+    """DefineShape4 only."""
+
+    data: bytes
+    """Complete tag body to compare shapes."""
+
+
+class PlaceObject(NamedTuple):
+    """
+    PlaceObject, PlaceObject2 or PlaceObject3 tag.
+    Fields that are not set by the tag are None.
+    """
+
+    name: str
+    depth: int
+    move: bool
+    character_id: int | None
+    matrix: Matrix | None
+    color_transform: ColorTransform | None
+    ratio: int | None
+    instance_name: str | None
+    clip_depth: int | None
+    class_name: str | None
+    """PlaceObject3 only."""
+
+    remainder: bytes
+    """Filters, blend mode, visibility, background and clip actions, not decoded."""
+
+
+class DefineEditText(NamedTuple):
+    """
+    DefineEditText tag.
+    """
+
+    character_id: int
+    bounds: Rect
+    flags: int
+    """Both flag bytes, HasText is the most significant bit."""
+
+    font_id: int | None
+    font_class: str | None
+    font_height: int | None
+    text_color: tuple[int, int, int, int] | None
+    max_length: int | None
+    layout: tuple[int, int, int, int, int] | None
+    """Align, left margin, right margin, indent and leading."""
+
+    variable_name: str
+    initial_text: str | None
+
+
+class DefineSprite(NamedTuple):
+    """
+    DefineSprite tag with its own tag stream.
+    """
+
+    sprite_id: int
+    frame_count: int
+    data: memoryview
+    """Tag stream of the sprite."""
+
+    def iter_tags(self):
+        return iter_tags(self.data)
+
+
+def iter_tags(data: memoryview, offset: int = 0) -> Iterator[Tag]:
+    """
+    Yields tags of tag stream <data> starting at <offset> until the EndTag.
+    Tags are not decoded until decode_tag is called for them.
+    """
+
+    data = memoryview(data)
+
+    while offset + 2 <= len(data):
+        tag_offset = offset
+        code_and_length: int = struct.unpack_from("<H", data, offset)[0]
+        offset += 2
+
+        code = code_and_length >> 6
+        length = code_and_length & 0x3F
+
+        # Long tag header
+        if length == 0x3F:
+            if offset + 4 > len(data):
+                raise errors.InvalidSWFFileError("Unexpected end of SWF tag header!")
+
+            length = struct.unpack_from("<I", data, offset)[0]
+            offset += 4
+
+        if offset + length > len(data):
+            raise errors.InvalidSWFFileError(f"Tag at offset {tag_offset} exceeds its SWF!")
+
+        if code == 0:
+            return
+
+        yield Tag(code, tag_offset, data[offset:offset + length])
+        offset += length
+
+
+def decode_tag(tag: Tag):
+    """
+    Decodes <tag> if it is supported.
+
+    Returns:
+        DefineShape, PlaceObject, DefineEditText, DefineSprite or None
+    """
+
+    reader = BitReader(tag.data)
+
+    try:
+        if tag.code in DEFINE_SHAPE_CODES:
+            shape_id = reader.read("<H")
+            shape_bounds = reader.read_rect()
+            edge_bounds = reader.read_rect() if tag.code == 83 else None
+
+            return DefineShape(tag.name, shape_id, shape_bounds, edge_bounds, bytes(tag.data))
+
+        if tag.code == 4:
+            character_id, depth = reader.read("<HH")
+            matrix = reader.read_matrix()
+            color_transform = None
+            if reader.offset < len(tag.data):
+                color_transform = reader.read_color_transform(with_alpha=False)
+
+            return PlaceObject(
+                tag.name, depth, False, character_id, matrix,
+                color_transform, None, None, None, None, b""
+            )
+
+        if tag.code in (26, 70):
+            return _decode_place_object(tag, reader)
+
+        if tag.code == 37:
+            return _decode_edit_text(reader)
+
+        if tag.code == 39:
+            sprite_id, frame_count = reader.read("<HH")
+
+            return DefineSprite(sprite_id, frame_count, tag.data[4:])
+
+    except struct.error as ex:
+        raise errors.InvalidSWFFileError(f"Failed to decode {tag.name}: {ex}") from ex
+
+    return None
+
+
+def _decode_place_object(tag: Tag, reader: BitReader):
+    flags: int = reader.read("B")
+    flags3: int = reader.read("B") if tag.code == 70 else 0
+    depth: int = reader.read("<H")
+
+    has_character = bool(flags & 0x02)
+    class_name = None
+
+    # HasClassName or HasImage with HasCharacter
+    if flags3 & 0x08 or (flags3 & 0x10 and has_character):
+        class_name = reader.read_string()
+
+    return PlaceObject(
+        name=tag.name,
+        depth=depth,
+        move=bool(flags & 0x01),
+        character_id=reader.read("<H") if has_character else None,
+        matrix=reader.read_matrix() if flags & 0x04 else None,
+        color_transform=reader.read_color_transform(with_alpha=True) if flags & 0x08 else None,
+        ratio=reader.read("<H") if flags & 0x10 else None,
+        instance_name=reader.read_string() if flags & 0x20 else None,
+        clip_depth=reader.read("<H") if flags & 0x40 else None,
+        class_name=class_name,
+        remainder=reader.read_rest()
+    )
+
+
+def _decode_edit_text(reader: BitReader):
+    character_id: int = reader.read("<H")
+    bounds = reader.read_rect()
+    flags: int = reader.read(">H")
+
+    has_font = bool(flags & 0x0100)
+    has_font_class = bool(flags & 0x0080)
+
+    font_id = reader.read("<H") if has_font else None
+    font_class = reader.read_string() if has_font_class else None
+    font_height = reader.read("<H") if has_font or has_font_class else None
+    text_color = reader.read("BBBB") if flags & 0x0400 else None
+    max_length = reader.read("<H") if flags & 0x0200 else None
+    layout = reader.read("<BHHHh") if flags & 0x0020 else None
+    variable_name = reader.read_string()
+    initial_text = reader.read_string() if flags & 0x8000 else None
+
+    return DefineEditText(
+        character_id, bounds, flags, font_id, font_class, font_height,
+        text_color, max_length, layout, variable_name, initial_text
+    )
+
+
+class SWFMovie:
+    """
+    Uncompressed SWF with its movie header and tag stream.
+    """
+
+    def __init__(self, version: int, data: bytes):
+        self.version = version
+        self.data = data
+
+        reader = BitReader(data)
+        self.frame_size = reader.read_rect()
+
+        # Frame rate is an 8.8 fixed-point value
+        frame_rate: int = reader.read("<H")
+        self.frame_rate = frame_rate / 256
+        self.frame_count: int = reader.read("<H")
+
+        self.tags_offset = reader.offset
+
+    def __repr__(self):
+        return "SWFMovie"
+
+    @staticmethod
+    def read(stream: BinaryIO):
+        """
+        Reads and decompresses SWF from <stream>.
+        """
+
+        signature, version, file_length = read_header(stream)
+        data = b"".join(_iter_data(stream, signature, file_length, CHUNK_SIZE))
+
+        return SWFMovie(version, data)
+
+    def iter_tags(self):
+        """
+        Yields top-level tags.
+        """
+
+        return iter_tags(self.data, self.tags_offset)
+
+    def get_shapes(self):
+        """
+        Returns DefineShape tags in document order.
+        """
+
+        return [
+            decode_tag(tag)
+            for tag in self.iter_tags()
+            if tag.code in DEFINE_SHAPE_CODES
+        ]
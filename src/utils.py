@@ -7,6 +7,7 @@ Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
 
 import ctypes
 import psutil
+import re
 import sys
 import subprocess
 from typing import Callable
@@ -122,13 +123,21 @@ def apply_dark_title_bar(widget: qtw.QWidget):
 
 def kill_child_process(parent_pid: int):
     """
-    Kills process with <parent_pid> and all its children.    
+    Kills process with <parent_pid> and all its children.
+    Processes that already exited are ignored.
     """
 
-    parent = psutil.Process(parent_pid)
-    for child in parent.children(recursive=True):
-        child.kill()
-    parent.kill()
+    try:
+        parent = psutil.Process(parent_pid)
+        children = parent.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return
+
+    for process in [*children, parent]:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
 
 def check_java():
     """
@@ -147,6 +156,54 @@ def check_java():
     except subprocess.CalledProcessError:
         return False
 
+def get_creation_flags():
+    """
+    Returns flags for starting console programs like java
+    without opening a console window.
+
+    DICK has no console of its own, so Windows would open
+    a new console window for every java process.
+    """
+
+    if sys.platform == "win32":
+        return subprocess.CREATE_NO_WINDOW
+
+    return 0
+
+def get_java_version():
+    """
+    Returns major version of java on PATH
+    or None if java could not be found.
+
+    For example, 8 for Java 1.8 and 17 for Java 17.0.7.
+    """
+
+    try:
+        output = subprocess.run(
+            ["java", "-version"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="ignore",
+            creationflags=get_creation_flags()
+        ).stdout
+    except OSError:
+        return None
+
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', output)
+
+    if match is None:
+        return None
+
+    major, minor = match.groups()
+
+    # Old versions are named like 1.8
+    if major == "1" and minor is not None:
+        return int(minor)
+
+    return int(major)
+
 def parse_path(path: Path):
     """
     Parses path in returns tuple with
@@ -0,0 +1,163 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains virtual file system for mods with loose files and BSAs.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+
+import os
+import shutil
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+import bsa_extractor as bsa
+
+
+class VirtualFile(NamedTuple):
+    """
+    Single file in a VirtualFileSystem.
+    """
+
+    filepath: str
+    """Relative path of file in its original case."""
+
+    archive: bsa.BSAArchive | None
+    """BSA that contains the file or None for loose files."""
+
+
+class VirtualFileSystem:
+    """
+    Case-insensitive file table of a mod folder
+    that contains its loose files and the files in its BSAs.
+
+    BSAs are loaded in alphabetical order and files in later BSAs
+    override files in earlier ones. Loose files override all BSAs,
+    like they do in game.
+    """
+
+    def __init__(self, root_path: Path, index_cache: bsa.BSAIndexCache = None):
+        self.root_path = root_path
+        self.index_cache = index_cache
+
+        self.archives: dict[Path, bsa.BSAArchive] = {}
+        self.files: dict[str, VirtualFile] = {}
+
+        self.load_archives()
+        self.load_loose_files()
+
+    def __repr__(self):
+        return "VirtualFileSystem"
+
+    def load_archives(self):
+        bsa_files = sorted(
+            self.root_path.glob("*.bsa"),
+            key=lambda bsa_file: bsa_file.name.lower()
+        )
+
+        for bsa_file in bsa_files:
+            archive = bsa.BSAArchive.open(bsa_file, self.index_cache)
+            self.archives[archive.filepath] = archive
+
+            for key, record in archive.index.items():
+                self.files[key] = VirtualFile(record.filepath, archive)
+
+    def load_loose_files(self):
+        for dirpath, dirnames, filenames in os.walk(self.root_path):
+            dirpath = Path(dirpath)
+
+            for filename in filenames:
+                filepath = (dirpath / filename).relative_to(self.root_path)
+
+                # BSAs are at the root of the mod and not part of its file tree
+                if filepath.suffix.lower() == ".bsa" and filepath.parent == Path("."):
+                    continue
+
+                self.files[bsa.normalize_path(filepath)] = VirtualFile(filepath.as_posix(), None)
+
+    def close(self):
+        """
+        Closes all BSAs.
+        """
+
+        for archive in self.archives.values():
+            archive.close()
+
+        self.archives.clear()
+        self.files.clear()
+
+    def get_file(self, file: str | Path):
+        """
+        Returns VirtualFile for <file> or None if it does not exist.
+
+        Parameters:
+            file: str or Path, relative to the mod's root folder
+        """
+
+        return self.files.get(bsa.normalize_path(file))
+
+    def exists(self, file: str | Path):
+        """
+        Checks if <file> exists as loose file or in a BSA.
+        """
+
+        return bsa.normalize_path(file) in self.files
+
+    def open_file(self, file: str | Path) -> BinaryIO:
+        """
+        Opens <file> as readable binary stream without
+        extracting it from its BSA.
+
+        Raises:
+            FileNotFoundError: if <file> does not exist
+        """
+
+        virtual_file = self.get_file(file)
+
+        if virtual_file is None:
+            raise FileNotFoundError(f"No file {str(file)!r} in {str(self.root_path)!r}")
+
+        if virtual_file.archive is None:
+            return (self.root_path / virtual_file.filepath).open("rb")
+
+        return virtual_file.archive.open_file(virtual_file.filepath)
+
+    def extract_files(
+            self,
+            to_dir: Path,
+            files: list[str | Path],
+            max_workers: int = None
+    ):
+        """
+        Copies or extracts <files> to <to_dir>/<file>.
+        Files from the same BSA are extracted at once.
+
+        Parameters:
+            to_dir: Path, directory to copy <files> to
+            files: list of str or Path, relative to the mod's root folder
+            max_workers: int, number of decompression threads per BSA
+
+        Returns:
+            missing_files: list of files that do not exist
+        """
+
+        missing_files: list[str | Path] = []
+        archive_files: dict[Path, list[str | Path]] = {}
+
+        for file in files:
+            virtual_file = self.get_file(file)
+
+            if virtual_file is None:
+                missing_files.append(file)
+            elif virtual_file.archive is None:
+                dst_path = to_dir / file
+                os.makedirs(dst_path.parent, exist_ok=True)
+                shutil.copyfile(self.root_path / virtual_file.filepath, dst_path)
+            else:
+                archive_files.setdefault(virtual_file.archive.filepath, []).append(file)
+
+        for bsa_file, files in archive_files.items():
+            os.makedirs(to_dir, exist_ok=True)
+            self.archives[bsa_file].extract_files(to_dir, files, max_workers)
+
+        return missing_files
@@ -0,0 +1,105 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains the XML backends that parse FFDec's XMLs.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+
+import logging
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import compact_tree
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+class XMLBackend:
+    """
+    Parses XMLs with Python's ElementTree.
+
+    Backends return trees with ElementTree's API, so that
+    the patch creator works with all of them the same way.
+    """
+
+    name = "etree"
+
+    def __repr__(self):
+        return "XMLBackend"
+
+    def parse(self, xml_path: Path) -> ET.ElementTree:
+        return ET.parse(str(xml_path))
+
+    def iterparse(self, xml_path: Path, events: tuple[str]):
+        return ET.iterparse(str(xml_path), events=events)
+
+
+class LXMLBackend(XMLBackend):
+    """
+    Parses XMLs with lxml, which uses libxml2.
+
+    Comments and processing instructions are removed since
+    ElementTree does not keep them either.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        self.parser = lxml_etree.XMLParser(
+            remove_comments=True,
+            remove_pis=True,
+            huge_tree=True
+        )
+
+    def parse(self, xml_path: Path) -> ET.ElementTree:
+        return lxml_etree.parse(str(xml_path), self.parser)
+
+    def iterparse(self, xml_path: Path, events: tuple[str]):
+        return lxml_etree.iterparse(
+            str(xml_path),
+            events=events,
+            remove_comments=True,
+            remove_pis=True,
+            huge_tree=True
+        )
+
+
+class CompactBackend(XMLBackend):
+    """
+    Parses XMLs into compact trees that need a fraction of
+    the memory of ElementTree's trees.
+
+    Streamed XMLs are still parsed with ElementTree, since only
+    a few of their elements are in memory at the same time.
+    """
+
+    name = "compact"
+
+    def parse(self, xml_path: Path) -> compact_tree.CompactTree:
+        return compact_tree.parse(xml_path)
+
+
+def get_backend(name: str):
+    """
+    Returns XML backend with <name>.
+    Falls back to ElementTree if lxml is not installed.
+    """
+
+    log = logging.getLogger("XMLBackend")
+
+    if name == CompactBackend.name:
+        return CompactBackend()
+
+    if name == LXMLBackend.name:
+        if lxml_etree is not None:
+            return LXMLBackend()
+
+        log.warning("lxml is not installed, falling back to ElementTree.")
+    elif name != XMLBackend.name:
+        log.warning(f"Unknown XML backend {name!r}, falling back to ElementTree.")
+
+    return XMLBackend()
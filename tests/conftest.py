@@ -0,0 +1,44 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains shared fixtures of the tests.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_PATH = Path(__file__).resolve().parent.parent / "src"
+FIXTURES_PATH = Path(__file__).resolve().parent / "fixtures"
+
+# Modules are imported like in DICK and patch_creator
+# loads assets/config.json from the working directory
+sys.path.insert(0, str(SRC_PATH))
+os.chdir(SRC_PATH)
+
+import xml_backend
+
+
+@pytest.fixture(params=["etree", "lxml", "compact"])
+def backend(request: pytest.FixtureRequest):
+    """
+    Every XML backend, lxml is skipped if it is not installed.
+    """
+
+    if request.param == "lxml" and xml_backend.lxml_etree is None:
+        pytest.skip("lxml is not installed")
+
+    return xml_backend.get_backend(request.param)
+
+
+@pytest.fixture
+def original_xml_path():
+    return FIXTURES_PATH / "original.xml"
+
+
+@pytest.fixture
+def patched_xml_path():
+    return FIXTURES_PATH / "patched.xml"
@@ -0,0 +1,144 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains tests for splitting timelines into frames.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from conftest import FIXTURES_PATH
+from patch_creator import PatchCreator
+
+
+FIXTURES = ["original.xml", "patched.xml"]
+
+
+def reference_split_frames(xml_element: ET.Element):
+    """
+    split_frames before it was rewritten to run in linear time.
+    """
+
+    new_frame = ET.Element("frame")
+    current_frame = 1
+    new_frame.set("frameId", str(current_frame))
+    new_frame_subtags = ET.Element("subTags")
+    new_frame.append(new_frame_subtags)
+
+    frame_delimiters = xml_element.findall("./item[@type='ShowFrameTag']")
+
+    for child in xml_element.findall("./"):
+        child = reference_split_frames(child)
+
+        if len(frame_delimiters) > 1:
+            xml_element.remove(child)
+
+            if child.get("type") != "ShowFrameTag":
+                new_frame_subtags.append(child)
+
+            elif child in frame_delimiters:
+                xml_element.append(new_frame)
+                new_frame = ET.Element("frame")
+                current_frame += 1
+                new_frame.set("frameId", str(current_frame))
+                new_frame_subtags = ET.Element("subTags")
+                new_frame.append(new_frame_subtags)
+
+    return xml_element
+
+
+def reference_unsplit_frames(xml_element: ET.Element):
+    """
+    unsplit_frames before it was rewritten to run in linear time.
+    """
+
+    for child in xml_element.findall("./"):
+        frames = child.findall("./frame")
+
+        for frame in frames:
+            child.remove(frame)
+
+            for frame_child in frame.findall("./subTags/"):
+                child.append(frame_child)
+
+            frame_tag = ET.Element("item")
+            frame_tag.set("type", "ShowFrameTag")
+            child.append(frame_tag)
+
+        reference_unsplit_frames(child)
+
+    return xml_element
+
+
+def dump(element, plain_show_frames: bool = False):
+    """
+    Returns tags, attributes and children of <element> for comparing
+    elements of every backend.
+
+    unsplit_frames recreates ShowFrameTags of split timelines without
+    FFDec's other attributes, <plain_show_frames> drops them for comparing.
+    """
+
+    items = list(element.items())
+
+    if plain_show_frames and element.get("type") == "ShowFrameTag":
+        items = [("type", "ShowFrameTag")]
+
+    return (
+        element.tag,
+        items,
+        [dump(child, plain_show_frames) for child in element]
+    )
+
+
+def parse(xml_path: Path):
+    return ET.parse(str(xml_path)).getroot()
+
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_round_trip(backend, fixture: str):
+    root = backend.parse(FIXTURES_PATH / fixture).getroot()
+    expected = dump(root, plain_show_frames=True)
+
+    PatchCreator.split_frames(root)
+    PatchCreator.unsplit_frames(root)
+
+    assert dump(root, plain_show_frames=True) == expected
+
+
+def test_split_frames_structure(original_xml_path: Path):
+    root = PatchCreator.split_frames(parse(original_xml_path))
+
+    tags = root.find("./tags")
+    assert [frame.get("frameId") for frame in tags] == ["1", "2", "3"]
+    assert all(frame.tag == "frame" for frame in tags)
+
+    # Only timelines with more than one frame are split
+    sprites = root.findall(".//item[@type='DefineSpriteTag']")
+    assert [len(sprite.findall("./subTags/frame")) for sprite in sprites] == [2, 0]
+
+    # ShowFrameTags are removed from split timelines
+    assert root.findall("./tags/frame/subTags/item[@type='ShowFrameTag']") == []
+
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_split_frames_matches_reference(fixture: str):
+    root = PatchCreator.split_frames(parse(FIXTURES_PATH / fixture))
+    reference_root = reference_split_frames(parse(FIXTURES_PATH / fixture))
+
+    assert ET.tostring(root) == ET.tostring(reference_root)
+
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_unsplit_frames_matches_reference(fixture: str):
+    root = PatchCreator.unsplit_frames(
+        PatchCreator.split_frames(parse(FIXTURES_PATH / fixture))
+    )
+    reference_root = reference_unsplit_frames(
+        reference_split_frames(parse(FIXTURES_PATH / fixture))
+    )
+
+    assert ET.tostring(root) == ET.tostring(reference_root)
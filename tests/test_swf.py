@@ -0,0 +1,343 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains tests for reading SWFs without FFDec.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+import io
+import lzma
+import struct
+import zlib
+
+import pytest
+
+import errors
+import swf
+
+
+class BitWriter:
+    """
+    Writes bit fields of SWF records, most significant bit first.
+    """
+
+    def __init__(self):
+        self.bits: list[int] = []
+
+    def ub(self, nbits: int, value: int):
+        self.bits += [(value >> (nbits - 1 - i)) & 1 for i in range(nbits)]
+        return self
+
+    def sb(self, nbits: int, value: int):
+        return self.ub(nbits, value & ((1 << nbits) - 1))
+
+    def to_bytes(self):
+        bits = self.bits + [0] * (-len(self.bits) % 8)
+
+        return bytes(
+            int("".join(map(str, bits[i:i + 8])), 2)
+            for i in range(0, len(bits), 8)
+        )
+
+
+def rect(x_min: int, x_max: int, y_min: int, y_max: int, nbits: int = 15):
+    writer = BitWriter().ub(5, nbits)
+    for value in (x_min, x_max, y_min, y_max):
+        writer.sb(nbits, value)
+
+    return writer.to_bytes()
+
+
+def matrix(scale: tuple[int, int] = None, rotate: tuple[int, int] = None, translate=(0, 0)):
+    writer = BitWriter()
+
+    for values in (scale, rotate):
+        writer.ub(1, values is not None)
+        if values is not None:
+            writer.ub(5, 20)
+            for value in values:
+                writer.sb(20, value)
+
+    writer.ub(5, 16)
+    for value in translate:
+        writer.sb(16, value)
+
+    return writer.to_bytes()
+
+
+def color_transform(mult_terms: tuple[int, ...] = None, add_terms: tuple[int, ...] = None):
+    writer = BitWriter().ub(1, add_terms is not None).ub(1, mult_terms is not None).ub(4, 10)
+
+    for terms in (mult_terms, add_terms):
+        for value in terms or ():
+            writer.sb(10, value)
+
+    return writer.to_bytes()
+
+
+def tag(code: int, body: bytes, long: bool = False):
+    if long or len(body) >= 0x3F:
+        return struct.pack("<HI", code << 6 | 0x3F, len(body)) + body
+
+    return struct.pack("<H", code << 6 | len(body)) + body
+
+
+def string(value: str):
+    return value.encode("utf8") + b"\0"
+
+
+def decode(data: bytes):
+    tags = list(swf.iter_tags(data))
+    assert len(tags) == 1
+
+    return swf.decode_tag(tags[0])
+
+
+SHAPE = tag(32, struct.pack("<H", 7) + rect(-20, 400, 0, 300) + b"\x00\x11\x22")
+SHAPE4 = tag(83, struct.pack("<H", 8) + rect(-10, 110, -10, 110) + rect(0, 100, 0, 100) + b"\x05")
+SPRITE = tag(
+    39,
+    struct.pack("<HH", 9, 2)
+    + tag(26, b"\x02" + struct.pack("<HH", 1, 7))
+    + tag(1, b"")
+    + tag(1, b"")
+    + tag(0, b"")
+)
+TAG_STREAM = SHAPE + SHAPE4 + SPRITE + tag(1, b"") + tag(0, b"")
+
+# Frame size, frame rate 30.0 and frame count
+MOVIE_BODY = rect(0, 25600, 0, 14400, nbits=16) + struct.pack("<HH", 30 << 8, 1) + TAG_STREAM
+
+
+def create_swf(signature: bytes, body: bytes = MOVIE_BODY, version: int = 15):
+    header = signature + bytes([version]) + struct.pack("<I", 8 + len(body))
+
+    if signature == b"CWS":
+        return header + zlib.compress(body)
+
+    if signature == b"ZWS":
+        # lzma's header has 5 bytes properties and 8 bytes uncompressed size,
+        # SWFs store the compressed size and the properties instead
+        compressed = lzma.compress(body, format=lzma.FORMAT_ALONE)
+        data = compressed[13:]
+        return header + struct.pack("<I", len(data)) + compressed[:5] + data
+
+    return header + body
+
+
+@pytest.mark.parametrize("signature", swf.SIGNATURES)
+def test_read_movie(signature: bytes):
+    data = create_swf(signature)
+    movie = swf.SWFMovie.read(io.BytesIO(data))
+
+    assert movie.version == 15
+    assert movie.frame_size == swf.Rect(0, 25600, 0, 14400)
+    assert movie.frame_rate == 30.0
+    assert movie.frame_count == 1
+    assert [tag.name for tag in movie.iter_tags()] == [
+        "DefineShape3Tag", "DefineShape4Tag", "DefineSpriteTag", "ShowFrameTag"
+    ]
+    assert [shape.shape_id for shape in movie.get_shapes()] == [7, 8]
+
+    assert b"".join(swf.iter_body(io.BytesIO(data))) == MOVIE_BODY
+
+
+def test_content_hash_ignores_compression():
+    hashes = {
+        swf.get_content_hash(io.BytesIO(create_swf(signature)))
+        for signature in swf.SIGNATURES
+    }
+
+    assert len(hashes) == 1
+    assert swf.get_content_hash(io.BytesIO(create_swf(b"FWS", version=14))) not in hashes
+
+
+@pytest.mark.parametrize("signature", [b"CWS", b"ZWS"])
+def test_corrupt_body(signature: bytes):
+    data = signature + bytes([15]) + struct.pack("<I", 1000) + b"garbage!" * 50
+
+    with pytest.raises(errors.InvalidSWFFileError):
+        swf.get_content_hash(io.BytesIO(data))
+
+    with pytest.raises(errors.InvalidSWFFileError):
+        swf.SWFMovie.read(io.BytesIO(data))
+
+
+def test_invalid_header():
+    with pytest.raises(errors.InvalidSWFFileError):
+        swf.read_header(io.BytesIO(b"GIF89a"))
+
+
+def test_iter_tags_long_header():
+    tags = list(swf.iter_tags(tag(1, b"", long=True) + tag(9, b"\x01\x02\x03") + tag(0, b"") + b"\xff"))
+
+    assert [(tag.code, tag.offset, bytes(tag.data)) for tag in tags] == [
+        (1, 0, b""),
+        (9, 6, b"\x01\x02\x03"),
+    ]
+
+
+def test_iter_tags_truncated():
+    with pytest.raises(errors.InvalidSWFFileError):
+        list(swf.iter_tags(tag(9, b"\x01\x02\x03")[:-1]))
+
+
+def test_decode_define_shape():
+    shape = decode(SHAPE)
+
+    assert shape.name == "DefineShape3Tag"
+    assert shape.shape_id == 7
+    assert shape.shape_bounds == swf.Rect(-20, 400, 0, 300)
+    assert shape.edge_bounds is None
+    assert shape.data == SHAPE[2:]
+
+    shape4 = decode(SHAPE4)
+
+    assert shape4.shape_bounds == swf.Rect(-10, 110, -10, 110)
+    assert shape4.edge_bounds == swf.Rect(0, 100, 0, 100)
+
+
+def test_decode_place_object():
+    place_object = decode(tag(
+        4,
+        struct.pack("<HH", 5, 3)
+        + matrix(translate=(100, -200))
+        + color_transform(mult_terms=(256, 128, 0))
+    ))
+
+    assert place_object == swf.PlaceObject(
+        "PlaceObjectTag", 3, False, 5,
+        swf.Matrix(1 << 16, 1 << 16, 0, 0, 100, -200),
+        swf.ColorTransform((256, 128, 0), (0, 0, 0)),
+        None, None, None, None, b""
+    )
+
+
+def test_decode_place_object2():
+    # HasClipDepth, HasName, HasRatio, HasColorTransform, HasMatrix, HasCharacter and Move
+    place_object = decode(tag(
+        26,
+        bytes([0x7F])
+        + struct.pack("<HH", 2, 12)
+        + matrix(scale=(98304, 98304), rotate=(10, -10), translate=(-100, 50))
+        + color_transform(mult_terms=(256, 256, 256, 200), add_terms=(-5, 0, 5, 0))
+        + struct.pack("<H", 3)
+        + string("HealthText")
+        + struct.pack("<H", 4)
+    ))
+
+    assert place_object == swf.PlaceObject(
+        name="PlaceObject2Tag",
+        depth=2,
+        move=True,
+        character_id=12,
+        matrix=swf.Matrix(98304, 98304, 10, -10, -100, 50),
+        color_transform=swf.ColorTransform((256, 256, 256, 200), (-5, 0, 5, 0)),
+        ratio=3,
+        instance_name="HealthText",
+        clip_depth=4,
+        class_name=None,
+        remainder=b""
+    )
+
+
+def test_decode_place_object2_move():
+    # Only Move, the character at the depth is not changed
+    place_object = decode(tag(26, bytes([0x01]) + struct.pack("<H", 6)))
+
+    assert place_object.move
+    assert place_object.depth == 6
+    assert place_object.character_id is None
+    assert place_object.matrix is None
+    assert place_object.color_transform is None
+
+
+def test_decode_place_object3():
+    # HasCharacter and HasMatrix, HasClassName and HasBlendMode
+    place_object = decode(tag(
+        70,
+        bytes([0x06, 0x0A])
+        + struct.pack("<H", 1)
+        + string("HUDMenu")
+        + struct.pack("<H", 20)
+        + matrix()
+        + b"\x0c"
+    ))
+
+    assert place_object.name == "PlaceObject3Tag"
+    assert place_object.depth == 1
+    assert place_object.character_id == 20
+    assert place_object.class_name == "HUDMenu"
+    assert place_object.matrix == swf.Matrix(1 << 16, 1 << 16, 0, 0, 0, 0)
+    assert place_object.remainder == b"\x0c"
+
+
+def test_decode_edit_text():
+    # HasText, HasTextColor, HasMaxLength, HasFont and HasLayout, HTML
+    flags = 0x8000 | 0x0400 | 0x0200 | 0x0100 | 0x0020 | 0x0002
+    edit_text = decode(tag(
+        37,
+        struct.pack("<H", 3)
+        + rect(-40, 3000, -40, 600)
+        + struct.pack(">H", flags)
+        + struct.pack("<HH", 11, 360)
+        + bytes([255, 200, 64, 255])
+        + struct.pack("<H", 32)
+        + struct.pack("<BHHHh", 1, 20, 40, 0, -2)
+        + string("health")
+        + string("<p>Health</p>")
+    ))
+
+    assert edit_text == swf.DefineEditText(
+        character_id=3,
+        bounds=swf.Rect(-40, 3000, -40, 600),
+        flags=flags,
+        font_id=11,
+        font_class=None,
+        font_height=360,
+        text_color=(255, 200, 64, 255),
+        max_length=32,
+        layout=(1, 20, 40, 0, -2),
+        variable_name="health",
+        initial_text="<p>Health</p>"
+    )
+
+
+def test_decode_edit_text_font_class():
+    # HasFontClass without HasFont
+    edit_text = decode(tag(
+        37,
+        struct.pack("<H", 4)
+        + rect(0, 100, 0, 100)
+        + struct.pack(">H", 0x0080)
+        + string("$EverywhereFont")
+        + struct.pack("<H", 240)
+        + string("")
+    ))
+
+    assert edit_text.font_id is None
+    assert edit_text.font_class == "$EverywhereFont"
+    assert edit_text.font_height == 240
+    assert edit_text.text_color is None
+    assert edit_text.initial_text is None
+
+
+def test_decode_define_sprite():
+    sprite = decode(SPRITE)
+
+    assert sprite.sprite_id == 9
+    assert sprite.frame_count == 2
+
+    sub_tags = list(sprite.iter_tags())
+
+    assert [tag.name for tag in sub_tags] == ["PlaceObject2Tag", "ShowFrameTag", "ShowFrameTag"]
+    assert swf.decode_tag(sub_tags[0]).character_id == 7
+
+
+def test_decode_truncated_tag():
+    with pytest.raises(errors.InvalidSWFFileError):
+        decode(tag(26, bytes([0x02]) + struct.pack("<H", 1)))
+
+
+def test_decode_unsupported_tag():
+    assert decode(tag(9, b"\x00\x00\x00")) is None
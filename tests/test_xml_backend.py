@@ -0,0 +1,54 @@
+"""
+Part of Dynamic Interface Construction Kit (DICK).
+Contains tests that every XML backend creates the same patch.
+
+Licensed under Attribution-NonCommercial-NoDerivatives 4.0 International
+"""
+
+from pathlib import Path
+
+import jstyleson as json
+
+from conftest import FIXTURES_PATH
+from patch_creator import PatchCreator, StreamingComparison
+from xml_backend import XMLBackend
+
+
+def create_patch_json(backend: XMLBackend, original_xml_path: Path, patched_xml_path: Path):
+    """
+    Compares the XMLs in memory like PatchCreator.compare_xml
+    and returns the patch JSON like PatchCreator.write_output.
+    """
+
+    original_root = PatchCreator.split_frames(backend.parse(original_xml_path).getroot())
+    patched_root = PatchCreator.split_frames(backend.parse(patched_xml_path).getroot())
+
+    patch_data = PatchCreator.compare_elements(original_root, patched_root, ".", "swf")
+
+    return json.dumps(patch_data, indent=4)
+
+
+def test_patch_json(backend: XMLBackend, original_xml_path: Path, patched_xml_path: Path):
+    expected = (FIXTURES_PATH / "patch.json").read_text(encoding="utf8")
+
+    assert create_patch_json(backend, original_xml_path, patched_xml_path) == expected
+
+
+def test_shape_changes(backend: XMLBackend, original_xml_path: Path, patched_xml_path: Path):
+    shape_changes = PatchCreator.get_shape_changes(
+        backend.parse(original_xml_path),
+        backend.parse(patched_xml_path)
+    )
+
+    # Different, added and removed shapes
+    assert shape_changes == (["1"], ["7"], ["6"])
+
+
+def test_streaming_comparison(original_xml_path: Path, patched_xml_path: Path):
+    expected = (FIXTURES_PATH / "patch.json").read_text(encoding="utf8")
+    patch_data = StreamingComparison(original_xml_path, patched_xml_path).compare()
+
+    assert json.dumps(patch_data, indent=4) == expected
+    assert StreamingComparison.get_shape_changes(original_xml_path, patched_xml_path) == (
+        ["1"], ["7"], ["6"]
+    )